@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+from metadata_service.adapter import metrics
+
+
+FileSignature = tuple[int, int, int]
+
+
+def file_signature(file_path: str) -> FileSignature:
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+# Parsed metadata json takes about six times the size of the file in
+# memory. Walking a large document to measure it takes seconds
+PARSED_JSON_SIZE_FACTOR = 6
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Adds up the sizes of value and everything it holds, counting each
+    object once. Objects that value shares with others are counted as
+    well, so the estimate errs on the high side.
+    """
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.extend(vars(current).values())
+    return size
+
+
+@dataclass
+class CacheEntry:
+    signature: Hashable
+    value: Any
+    size: int
+    digest: Optional[str] = None
+    derived: dict[Hashable, Any] = field(default_factory=dict)
+    load: Optional[Callable[[str], tuple[Any, str]]] = None
+    stored: bool = False
+
+
+class LRUCache:
+    """Least recently used cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._entries_by_value_id: dict[int, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+        os.register_at_fork(after_in_child=self.reset_stats)
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(
+        self, key: Hashable, signature: Hashable
+    ) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def lookup_current(self, key: Hashable) -> Optional[CacheEntry]:
+        """Returns the entry for key without checking its signature."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def peek(self, key: Hashable, signature: Hashable) -> Optional[CacheEntry]:
+        """Returns the entry like lookup, without counting or reordering."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                return entry
+            return None
+
+    def contains(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def items(self) -> list[tuple[Hashable, CacheEntry]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def store(
+        self, key: Hashable, signature: Hashable, value: Any, size: int
+    ) -> None:
+        self.store_entry(key, CacheEntry(signature, value, size))
+
+    def store_entry(self, key: Hashable, entry: CacheEntry) -> None:
+        self.store_entries({key: entry})
+
+    def store_entries(self, entries: dict[Hashable, CacheEntry]) -> None:
+        """Replaces all the entries at once, under a single lock."""
+        with self._lock:
+            for key, entry in entries.items():
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._forget(previous)
+                if entry.size > self.max_bytes:
+                    self._unstage(entry)
+                    continue
+                self._entries[key] = entry
+                self._entries_by_value_id[id(entry.value)] = entry
+                entry.stored = True
+                self.current_bytes += entry.size
+            self._evict()
+
+    def discard(self, keys: list[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._forget(entry)
+
+    def stage(self, entries: list[CacheEntry]) -> None:
+        """
+        Lets get_derived build on entries before they are stored, so that
+        they can be stored together with their derived values.
+        """
+        with self._lock:
+            for entry in entries:
+                self._entries_by_value_id[id(entry.value)] = entry
+
+    def unstage(self, entries: list[CacheEntry]) -> None:
+        with self._lock:
+            for entry in entries:
+                self._unstage(entry)
+
+    def get_derived(
+        self, value: Any, name: Hashable, build: Callable[[Any], Any]
+    ) -> Any:
+        """
+        Returns build(value), computed once for as long as value is
+        cached. Values that are not in the cache are built every time.
+        The estimated size of what is built counts toward the size of the
+        entry.
+        """
+        with self._lock:
+            entry = self._entries_by_value_id.get(id(value))
+        if entry is None or entry.value is not value:
+            return build(value)
+        if name not in entry.derived:
+            derived = build(value)
+            size = estimate_size(derived)
+            with self._lock:
+                if name not in entry.derived:
+                    entry.derived[name] = derived
+                    entry.size += size
+                    if entry.stored:
+                        self.current_bytes += size
+                        self._evict()
+        return entry.derived[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.stored = False
+            self._entries.clear()
+            self._entries_by_value_id.clear()
+            self.current_bytes = 0
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._forget(evicted)
+            self.evictions += 1
+
+    def _forget(self, entry: CacheEntry) -> None:
+        self.current_bytes -= entry.size
+        entry.stored = False
+        self._unstage(entry)
+
+    def _unstage(self, entry: CacheEntry) -> None:
+        if self._entries_by_value_id.get(id(entry.value)) is entry:
+            del self._entries_by_value_id[id(entry.value)]
+
+
+def _parsed_size(signature: FileSignature) -> int:
+    _, file_size, _ = signature
+    return file_size * PARSED_JSON_SIZE_FACTOR
+
+
+def load_json(file_path: str) -> tuple[Any, str]:
+    with metrics.timed("datastore_file_read_seconds", {"format": "json"}):
+        with open(file_path, "rb") as f:
+            content = f.read()
+    with metrics.timed("datastore_file_parse_seconds", {"format": "json"}):
+        value = json.loads(content)
+    return value, hashlib.sha256(content).hexdigest()
+
+
+def cache_samples(name: str, cache: LRUCache) -> list[metrics.Sample]:
+    labels = {"cache": name}
+    return [
+        ("cache_hits_total", labels, cache.hits),
+        ("cache_misses_total", labels, cache.misses),
+        ("cache_evictions_total", labels, cache.evictions),
+        ("cache_size_bytes", labels, cache.current_bytes),
+    ]
+
+
+class FileCache(LRUCache):
+    """
+    Cache of parsed files, valid while (mtime, size, inode) is unchanged.
+    When validate_on_read is False the files are not checked on access,
+    and the cached entries are kept up to date with reload instead.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        self.validate_on_read = True
+
+    def get(
+        self, file_path: str, load: Callable[[str], tuple[Any, str]]
+    ) -> Any:
+        return self.get_entry(file_path, load).value
+
+    def get_entry(
+        self, file_path: str, load: Callable[[str], tuple[Any, str]]
+    ) -> CacheEntry:
+        """
+        load returns the parsed content of the file together with a
+        digest of the content.
+        """
+        if not self.validate_on_read:
+            entry = self.lookup_current(file_path)
+            if entry is not None:
+                return entry
+        signature = file_signature(file_path)
+        if self.validate_on_read:
+            entry = self.lookup(file_path, signature)
+            if entry is not None:
+                return entry
+        value, digest = load(file_path)
+        entry = CacheEntry(
+            signature, value, _parsed_size(signature), digest, load=load
+        )
+        self.store_entry(file_path, entry)
+        return entry
+
+    def load_entry(
+        self, file_path: str, load: Callable[[str], tuple[Any, str]]
+    ) -> Optional[CacheEntry]:
+        """
+        Loads file_path without storing it. Returns None if the file
+        changed while it was read, as it may be only partly written.
+        """
+        signature = file_signature(file_path)
+        value, digest = load(file_path)
+        if file_signature(file_path) != signature:
+            return None
+        return CacheEntry(
+            signature, value, _parsed_size(signature), digest, load=load
+        )
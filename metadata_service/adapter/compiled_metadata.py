@@ -0,0 +1,124 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import msgpack
+
+MAGIC = b"MDSMETA1"
+_HEADER_LENGTH = struct.Struct("<Q")
+_RECORDS_START = len(MAGIC) + _HEADER_LENGTH.size
+
+
+def compile_metadata_all(json_file: str, compiled_file: str) -> None:
+    """
+    Writes metadata_all from json_file as a header followed by one
+    msgpack record per data structure. The header holds the rest of the
+    document, an offset table by data structure name and the size,
+    mtime and digest of json_file.
+    """
+    stat = os.stat(json_file)
+    with open(json_file, "rb") as f:
+        content = f.read()
+    metadata_all = json.loads(content)
+
+    records = [
+        msgpack.packb(data_structure)
+        for data_structure in metadata_all["dataStructures"]
+    ]
+    offsets = []
+    position = 0
+    for record in records:
+        offsets.append([position, len(record)])
+        position += len(record)
+    header = msgpack.packb(
+        {
+            "source": {
+                "size": stat.st_size,
+                "mtimeNs": stat.st_mtime_ns,
+                "digest": hashlib.sha256(content).hexdigest(),
+            },
+            "keys": list(metadata_all),
+            "document": {
+                key: value
+                for key, value in metadata_all.items()
+                if key != "dataStructures"
+            },
+            "names": [
+                data_structure["name"]
+                for data_structure in metadata_all["dataStructures"]
+            ],
+            "offsets": offsets,
+        }
+    )
+
+    temporary_file = f"{compiled_file}.tmp"
+    with open(temporary_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for record in records:
+            f.write(record)
+    os.replace(temporary_file, compiled_file)
+
+
+class CompiledMetadata:
+    """Read access to a compiled metadata_all file through mmap."""
+
+    def __init__(self, compiled_file: str):
+        with open(compiled_file, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(
+                f"{compiled_file} is not a compiled metadata file"
+            )
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        header = msgpack.unpackb(
+            self._mmap[_RECORDS_START : _RECORDS_START + header_length]
+        )
+        self.header_size = header_length
+        self.source_size = header["source"]["size"]
+        self.source_mtime_ns = header["source"]["mtimeNs"]
+        self.source_digest = header["source"]["digest"]
+        self._keys = header["keys"]
+        self._document = header["document"]
+        self._offsets = header["offsets"]
+        self._records_start = _RECORDS_START + header_length
+        self.positions = {
+            name: position for position, name in enumerate(header["names"])
+        }
+
+    def is_compiled_from(self, size: int, mtime_ns: int) -> bool:
+        return self.source_size == size and self.source_mtime_ns == mtime_ns
+
+    def data_structure(self, position: int) -> dict:
+        offset, length = self._offsets[position]
+        start = self._records_start + offset
+        return msgpack.unpackb(self._mmap[start : start + length])
+
+    def data_structures(self, names: list[str]) -> list[dict]:
+        """Decodes only the named data structures, in file order."""
+        return [
+            self.data_structure(position)
+            for position in sorted(
+                {
+                    self.positions[name]
+                    for name in names
+                    if name in self.positions
+                }
+            )
+        ]
+
+    def metadata_all(self) -> dict:
+        return {
+            key: (
+                [
+                    self.data_structure(position)
+                    for position in range(len(self._offsets))
+                ]
+                if key == "dataStructures"
+                else self._document[key]
+            )
+            for key in self._keys
+        }
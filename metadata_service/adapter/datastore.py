@@ -1,39 +1,234 @@
-import json
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
 
+from metadata_service.adapter import metrics
+from metadata_service.adapter.cache import (
+    FileCache,
+    FileSignature,
+    cache_samples,
+    file_signature,
+    load_json,
+)
+from metadata_service.adapter.compiled_metadata import CompiledMetadata
+from metadata_service.adapter.watcher import DatastoreWatcher
 from metadata_service.config import environment
 from metadata_service.domain.version import Version
 from metadata_service.exceptions.exceptions import DataNotFoundException
 
 DATASTORE_ROOT_DIR = environment.get("DATASTORE_ROOT_DIR")
 
+file_cache = FileCache(int(environment.get("METADATA_CACHE_MAX_BYTES")))
 
-def get_draft_version() -> dict:
-    json_file = f"{DATASTORE_ROOT_DIR}/datastore/draft_version.json"
-    with open(json_file, encoding="utf-8") as f:
-        return json.load(f)
+_METADATA_ALL_FILE = re.compile(r"/metadata_all__[^/]*\.json$")
 
 
-def get_datastore_versions() -> dict:
-    datastore_versions_json = (
-        f"{DATASTORE_ROOT_DIR}/datastore/datastore_versions.json"
-    )
-    with open(datastore_versions_json, encoding="utf-8") as f:
-        return json.load(f)
+def _metrics_samples() -> list[metrics.Sample]:
+    loaded = [
+        entry
+        for path, entry in file_cache.items()
+        if _METADATA_ALL_FILE.search(path)
+    ]
+    return [
+        *cache_samples("file", file_cache),
+        ("loaded_versions", {}, len(loaded)),
+        ("loaded_versions_size_bytes", {}, sum(e.size for e in loaded)),
+    ]
+
+
+metrics.register_collector(_metrics_samples)
+
+
+@dataclass(frozen=True)
+class CacheValidator:
+    """Identifies the content of one or more datastore files."""
 
+    signature: tuple
+    digest: str
+    last_modified: float
 
-def get_metadata_all(version: Version) -> str:
+
+def _draft_version_path() -> str:
+    return f"{DATASTORE_ROOT_DIR}/datastore/draft_version.json"
+
+
+def _datastore_versions_path() -> str:
+    return f"{DATASTORE_ROOT_DIR}/datastore/datastore_versions.json"
+
+
+def _metadata_all_path(version: Version, extension: str = "json") -> str:
     if version.is_draft():
         file_version = "DRAFT"
     else:
         file_version = version.to_3_underscored()
+    return (
+        f"{DATASTORE_ROOT_DIR}/datastore/"
+        f"metadata_all__{file_version}.{extension}"
+    )
 
-    metadata_all_file_path = (
-        f"{DATASTORE_ROOT_DIR}/datastore/" f"metadata_all__{file_version}.json"
+
+def _get_validator(
+    files: list[tuple[FileSignature, str]],
+) -> CacheValidator:
+    return CacheValidator(
+        signature=tuple(signature for signature, _ in files),
+        digest=hashlib.sha256(
+            "".join(digest for _, digest in files).encode("utf-8")
+        ).hexdigest(),
+        last_modified=max(signature[0] for signature, _ in files) / 1e9,
     )
+
+
+def _file_version(file_path: str) -> tuple[FileSignature, str]:
+    entry = file_cache.get_entry(file_path, load_json)
+    return entry.signature, entry.digest
+
+
+def _metadata_all_file_version(version: Version) -> tuple[FileSignature, str]:
+    json_file = _metadata_all_path(version)
+    if file_cache.contains(json_file):
+        return _file_version(json_file)
+    compiled = _get_compiled_metadata(json_file)
+    if compiled is not None:
+        return file_signature(json_file), compiled.source_digest
+    return _file_version(json_file)
+
+
+def get_draft_version() -> dict:
+    return file_cache.get(_draft_version_path(), load_json)
+
+
+def get_datastore_versions() -> dict:
+    return file_cache.get(_datastore_versions_path(), load_json)
+
+
+def _load_metadata_all(json_file: str) -> tuple[dict, str]:
+    compiled = _get_compiled_metadata(json_file)
+    if compiled is not None:
+        with metrics.timed(
+            "datastore_file_parse_seconds", {"format": "compiled"}
+        ):
+            return compiled.metadata_all(), compiled.source_digest
+    return load_json(json_file)
+
+
+def get_metadata_all(version: Version) -> dict:
     try:
-        with open(metadata_all_file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return file_cache.get(_metadata_all_path(version), _load_metadata_all)
     except FileNotFoundError as e:
         raise DataNotFoundException(
             f"metadata_all for version {version} not found"
         ) from e
+
+
+def get_compiled_metadata(version: Version) -> Optional[CompiledMetadata]:
+    """
+    Returns the compiled metadata_all for this version if there is one
+    that was compiled from the current json file, otherwise None.
+    """
+    return _get_compiled_metadata(_metadata_all_path(version))
+
+
+def _get_compiled_metadata(json_file: str) -> Optional[CompiledMetadata]:
+    compiled_file = f"{json_file.removesuffix('.json')}.compiled"
+    try:
+        signature = file_signature(compiled_file)
+        json_signature = file_signature(json_file)
+    except FileNotFoundError:
+        return None
+    entry = file_cache.lookup(compiled_file, signature)
+    if entry is not None:
+        compiled = entry.value
+    else:
+        compiled = CompiledMetadata(compiled_file)
+        file_cache.store(
+            compiled_file, signature, compiled, compiled.header_size
+        )
+    mtime_ns, size, _ = json_signature
+    if not compiled.is_compiled_from(size, mtime_ns):
+        return None
+    return compiled
+
+
+def get_compiled_data_structures(
+    version: Version, names: list[str]
+) -> Optional[list[dict]]:
+    """
+    Decodes only the named data structures from the compiled
+    metadata_all, or returns None if there is no usable compiled file
+    or the full document is cached already.
+    """
+    if file_cache.contains(_metadata_all_path(version)):
+        return None
+    compiled = get_compiled_metadata(version)
+    if compiled is None:
+        return None
+    return compiled.data_structures(names)
+
+
+def get_metadata_all_validator(
+    *versions: Version,
+) -> Optional[CacheValidator]:
+    """
+    Returns the validator for the files behind metadata_all for these
+    versions, or None if any of the files do not exist.
+    """
+    try:
+        files = [_metadata_all_file_version(version) for version in versions]
+        if any(version.is_draft() for version in versions):
+            files.append(_file_version(_draft_version_path()))
+    except FileNotFoundError:
+        return None
+    return _get_validator(files)
+
+
+def get_datastore_validator() -> Optional[CacheValidator]:
+    """
+    Returns the validator for datastore_versions.json and
+    draft_version.json, or None if either does not exist.
+    """
+    try:
+        return _get_validator(
+            [
+                _file_version(_datastore_versions_path()),
+                _file_version(_draft_version_path()),
+            ]
+        )
+    except FileNotFoundError:
+        return None
+
+
+def is_metadata_all_cached(version: Version) -> bool:
+    return file_cache.contains(_metadata_all_path(version))
+
+
+def get_cache_headroom() -> int:
+    """Returns how many bytes can be cached before anything is evicted."""
+    return file_cache.max_bytes - file_cache.current_bytes
+
+
+def get_derived(
+    document: dict, name: str, build: Callable[[dict], Any]
+) -> Any:
+    """
+    Returns build(document), computed once per loaded file. The result
+    is discarded together with the document when the file changes.
+    """
+    return file_cache.get_derived(document, name, build)
+
+
+def start_watcher(on_reload: Callable[[dict], None]) -> DatastoreWatcher:
+    """
+    Reloads changed datastore files in the background from now on,
+    instead of checking them on every read. on_reload is called with
+    each reloaded document before it replaces the previous one.
+    """
+    watcher = DatastoreWatcher(
+        f"{DATASTORE_ROOT_DIR}/datastore",
+        file_cache,
+        on_reload,
+        float(environment.get("DATASTORE_WATCH_INTERVAL")),
+    )
+    watcher.start()
+    return watcher
@@ -0,0 +1,298 @@
+"""
+Counters, gauges and histograms exposed in the Prometheus text format.
+
+Values are kept per process. With METRICS_DIR set, every process writes
+its values to METRICS_DIR/metrics_<pid>.json, at most every
+FLUSH_INTERVAL_SECONDS, and the process that is scraped adds up the
+files of all processes. Counters and histograms of processes that have
+exited are kept, while gauges are only reported for live processes.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from metadata_service.config import environment
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = tuple(1024 * 4**power for power in range(10))
+FLUSH_INTERVAL_SECONDS = 1.0
+
+METRICS = {
+    "http_requests_total": ("counter", "Requests by route and status."),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request latency by route.",
+    ),
+    "http_response_size_bytes": (
+        "histogram",
+        "Response body size by route, format and encoding.",
+    ),
+    "datastore_file_read_seconds": (
+        "histogram",
+        "Time spent reading datastore files from disk.",
+    ),
+    "datastore_file_parse_seconds": (
+        "histogram",
+        "Time spent parsing datastore files.",
+    ),
+    "response_encode_seconds": (
+        "histogram",
+        "Time spent encoding response bodies by format.",
+    ),
+    "response_compress_seconds": (
+        "histogram",
+        "Time spent compressing response bodies by encoding.",
+    ),
+    "log_records_dropped_total": (
+        "counter",
+        "Log records dropped because the log queue was full.",
+    ),
+    "cache_hits_total": ("counter", "Cache hits by cache."),
+    "cache_misses_total": ("counter", "Cache misses by cache."),
+    "cache_evictions_total": ("counter", "Cache evictions by cache."),
+    "cache_size_bytes": ("gauge", "Estimated size of a cache by process."),
+    "loaded_versions": (
+        "gauge",
+        "Versions with metadata_all in memory by process.",
+    ),
+    "loaded_versions_size_bytes": (
+        "gauge",
+        "Estimated size of the loaded versions by process.",
+    ),
+}
+
+Labels = tuple[tuple[str, str], ...]
+Sample = tuple[str, dict[str, str], float]
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, Labels], float] = {}
+_histograms: dict[tuple[str, Labels], list] = {}
+_collectors: list[Callable[[], list[Sample]]] = []
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, labels: dict[str, str], amount: float = 1) -> None:
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(
+    name: str,
+    labels: dict[str, str],
+    value: float,
+    buckets: tuple = DURATION_BUCKETS,
+) -> None:
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = [list(buckets), [0] * len(buckets), 0.0, 0]
+            _histograms[key] = histogram
+        bounds, counts, _, _ = histogram
+        for position, bound in enumerate(bounds):
+            if value <= bound:
+                counts[position] += 1
+                break
+        histogram[2] += value
+        histogram[3] += 1
+
+
+@contextmanager
+def timed(name: str, labels: dict[str, str]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, labels, time.perf_counter() - started)
+
+
+def register_collector(collect: Callable[[], list[Sample]]) -> None:
+    """
+    collect returns (name, labels, value) samples of counters and
+    gauges that are kept elsewhere, and is called on every snapshot.
+    """
+    _collectors.append(collect)
+
+
+def _reset() -> None:
+    """Forked processes report only what they did themselves."""
+    global _last_flush
+    _counters.clear()
+    _histograms.clear()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset)
+
+
+def _snapshot() -> dict:
+    with _lock:
+        counters = [
+            [name, list(labels), value]
+            for (name, labels), value in _counters.items()
+        ]
+        histograms = [
+            [name, list(labels), *histogram]
+            for (name, labels), histogram in _histograms.items()
+        ]
+    gauges = []
+    for collect in _collectors:
+        for name, labels, value in collect():
+            sample = [name, list(_labels(labels)), value]
+            if METRICS[name][0] == "gauge":
+                gauges.append(sample)
+            else:
+                counters.append(sample)
+    return {
+        "pid": os.getpid(),
+        "counters": counters,
+        "histograms": histograms,
+        "gauges": gauges,
+    }
+
+
+def flush(force: bool = False) -> None:
+    """Writes this process's values to METRICS_DIR, if it is set."""
+    global _last_flush
+    metrics_dir = environment.get("METRICS_DIR")
+    if not metrics_dir:
+        return
+    with _flush_lock:
+        now = time.monotonic()
+        if not force and now - _last_flush < FLUSH_INTERVAL_SECONDS:
+            return
+        _last_flush = now
+        path = f"{metrics_dir}/metrics_{os.getpid()}.json"
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(_snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+
+def clear_directory() -> None:
+    """Removes the values of earlier runs from METRICS_DIR."""
+    metrics_dir = environment.get("METRICS_DIR")
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(f"{metrics_dir}/metrics_*.json"):
+        os.remove(path)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshots() -> list[dict]:
+    metrics_dir = environment.get("METRICS_DIR")
+    if not metrics_dir:
+        return [_snapshot()]
+    flush(force=True)
+    snapshots = []
+    for path in glob.glob(f"{metrics_dir}/metrics_*.json"):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+    return snapshots
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[tuple] = None) -> str:
+    pairs = [*labels, *([extra] if extra else [])]
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+        + "}"
+    )
+
+
+def render() -> str:
+    """Returns the values of all processes in the Prometheus format."""
+    counters: dict[tuple[str, Labels], float] = {}
+    histograms: dict[tuple[str, Labels], list] = {}
+    gauges: dict[tuple[str, Labels], float] = {}
+    for snapshot in _snapshots():
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, bounds, counts, total, count in snapshot[
+            "histograms"
+        ]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(
+                key, [bounds, [0] * len(bounds), 0.0, 0]
+            )
+            merged[1] = [a + b for a, b in zip(merged[1], counts)]
+            merged[2] += total
+            merged[3] += count
+        if snapshot["pid"] == os.getpid() or _is_alive(snapshot["pid"]):
+            for name, labels, value in snapshot["gauges"]:
+                labels = (*map(tuple, labels), ("pid", str(snapshot["pid"])))
+                gauges[(name, tuple(sorted(labels)))] = value
+
+    lines = []
+    for name, (metric_type, description) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "histogram":
+            for (sample_name, labels), histogram in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+                bounds, counts, total, count = histogram
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f"{name}_bucket"
+                        f"{_format_labels(labels, ('le', repr(float(bound))))}"
+                        f" {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))}"
+                    f" {count}"
+                )
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        else:
+            samples = counters if metric_type == "counter" else gauges
+            for (sample_name, labels), value in sorted(samples.items()):
+                if sample_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,159 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import threading
+from typing import Any, Callable, Optional
+
+from metadata_service.adapter.cache import (
+    CacheEntry,
+    FileCache,
+    file_signature,
+)
+
+logger = logging.getLogger()
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_EVENTS = (
+    _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+
+
+def _open_inotify(directory: str) -> Optional[int]:
+    """
+    Returns an inotify file descriptor watching directory, or None where
+    inotify is not available.
+    """
+    try:
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_EVENTS) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DatastoreWatcher:
+    """
+    Reloads the cached files in a directory when they change, in a
+    background thread. Changed files are loaded and passed to on_reload
+    while requests are still served from the previous entries, and are
+    then swapped into the cache all at once. Files that fail to load are
+    kept as they are and tried again on the next check.
+
+    Changes are picked up through inotify where available, and by
+    checking every interval seconds in any case. The thread does not
+    survive a fork, so a forked process must start its own watcher.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        file_cache: FileCache,
+        on_reload: Callable[[Any], None],
+        interval: float,
+    ):
+        self.directory = directory
+        self.file_cache = file_cache
+        self.on_reload = on_reload
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+
+    def start(self) -> None:
+        self.file_cache.validate_on_read = False
+        self._start_thread()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._close_inotify()
+        self.file_cache.validate_on_read = True
+
+    def check(self) -> list[str]:
+        """
+        Reloads the changed files, drops the files that were removed, and
+        returns the paths of both.
+        """
+        reloaded: dict[str, CacheEntry] = {}
+        removed: list[str] = []
+        for file_path, entry in self.file_cache.items():
+            if entry.load is None:
+                continue
+            try:
+                if file_signature(file_path) == entry.signature:
+                    continue
+                new_entry = self.file_cache.load_entry(file_path, entry.load)
+            except FileNotFoundError:
+                removed.append(file_path)
+                continue
+            except Exception as e:
+                logger.warning(f"Could not reload {file_path}: {e}")
+                continue
+            if new_entry is not None:
+                reloaded[file_path] = new_entry
+        if removed:
+            self.file_cache.discard(removed)
+            logger.info(f"Dropped removed {', '.join(removed)}")
+        if not reloaded:
+            return removed
+        self.file_cache.stage(list(reloaded.values()))
+        for file_path, entry in reloaded.items():
+            try:
+                self.on_reload(entry.value)
+            except Exception:
+                logger.exception(f"Could not index {file_path}")
+        self.file_cache.store_entries(reloaded)
+        logger.info(f"Reloaded {', '.join(reloaded)}")
+        return [*reloaded, *removed]
+
+    def _start_thread(self) -> None:
+        self._close_inotify()
+        self._inotify_fd = _open_inotify(self.directory)
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="datastore-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wait_for_change()
+            if self._stopped.is_set():
+                return
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Datastore watcher check failed")
+
+    def _wait_for_change(self) -> None:
+        if self._inotify_fd is None:
+            self._stopped.wait(self.interval)
+            return
+        readable, _, _ = select.select(
+            [self._inotify_fd], [], [], self.interval
+        )
+        if readable:
+            try:
+                while os.read(self._inotify_fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _close_inotify(self) -> None:
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
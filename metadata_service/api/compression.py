@@ -0,0 +1,48 @@
+import gzip
+import threading
+from typing import Callable, Optional
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies below this size are not worth the compression overhead
+MIN_COMPRESS_BYTES = 1024
+
+# A ZstdCompressor must not be used by several threads at once, so each
+# thread gets its own
+_zstd = threading.local()
+
+
+def _zstd_compress(body: bytes) -> bytes:
+    compressor = getattr(_zstd, "compressor", None)
+    if compressor is None:
+        compressor = _zstd.compressor = zstandard.ZstdCompressor(level=12)
+    return compressor.compress(body)
+
+
+COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _zstd_compress
+if brotli is not None:
+    COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=9)
+# mtime=0 keeps the bytes, and with them the ETag, the same in every worker
+COMPRESSORS["gzip"] = lambda body: gzip.compress(
+    body, compresslevel=9, mtime=0
+)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    return parse_accept_header(accept_encoding).best_match(list(COMPRESSORS))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return COMPRESSORS[encoding](body)
@@ -0,0 +1,101 @@
+import json
+from typing import Any, Iterator, Optional, Union
+
+import msgpack
+from flask import Response, request
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+MEDIA_TYPES = [JSON, MSGPACK]
+
+
+def negotiate_media_type(accept_header: Optional[str]) -> str:
+    return parse_accept_header(accept_header, MIMEAccept).best_match(
+        MEDIA_TYPES, default=JSON
+    )
+
+
+def request_media_type() -> str:
+    return negotiate_media_type(request.headers.get("Accept"))
+
+
+def encode(payload: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.dumps(payload)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def encode_chunks(payload: Any, media_type: str) -> Iterator[bytes]:
+    """
+    Encodes payload in pieces, one item at a time for lists at the top
+    level or directly below it, so that the whole body is never held in
+    memory at once.
+    """
+    if media_type == MSGPACK:
+        yield from _msgpack_chunks(payload)
+    else:
+        yield from _json_chunks(payload)
+
+
+def _json_chunks(payload: Any) -> Iterator[bytes]:
+    if isinstance(payload, dict):
+        yield b"{"
+        for position, key in enumerate(sorted(payload)):
+            if position > 0:
+                yield b","
+            yield encode(key, JSON) + b":"
+            yield from _json_list_chunks(payload[key])
+        yield b"}"
+    else:
+        yield from _json_list_chunks(payload)
+
+
+def _json_list_chunks(value: Any) -> Iterator[bytes]:
+    if not isinstance(value, list):
+        yield encode(value, JSON)
+        return
+    yield b"["
+    for position, item in enumerate(value):
+        if position > 0:
+            yield b","
+        yield encode(item, JSON)
+    yield b"]"
+
+
+def _msgpack_chunks(payload: Any) -> Iterator[bytes]:
+    packer = msgpack.Packer()
+    if isinstance(payload, dict):
+        yield packer.pack_map_header(len(payload))
+        for key, value in payload.items():
+            yield packer.pack(key)
+            yield from _msgpack_list_chunks(packer, value)
+    else:
+        yield from _msgpack_list_chunks(packer, payload)
+
+
+def _msgpack_list_chunks(
+    packer: msgpack.Packer, value: Any
+) -> Iterator[bytes]:
+    if not isinstance(value, list):
+        yield packer.pack(value)
+        return
+    yield packer.pack_array_header(len(value))
+    for item in value:
+        yield packer.pack(item)
+
+
+def body_response(
+    body: Union[bytes, Iterator[bytes]], media_type: str
+) -> Response:
+    response = Response(body, mimetype=media_type)
+    response.vary.add("Accept")
+    return response
+
+
+def encoded_response(payload: Any) -> Response:
+    media_type = request_media_type()
+    return body_response(encode(payload, media_type), media_type)
@@ -1,11 +1,27 @@
 import logging
 
-from flask import Blueprint, jsonify
+from flask import Blueprint
 from flask_pydantic import validate
 
-from metadata_service.api.request_models import NameParam, MetadataQuery
+from metadata_service.api.content_negotiation import encoded_response
+from metadata_service.api.pagination import (
+    decode_cursor,
+    decode_offset_cursor,
+    next_cursor_headers,
+)
+from metadata_service.api.request_models import (
+    BatchQuery,
+    CodeListQuery,
+    DiffQuery,
+    MetadataQuery,
+    NameParam,
+    PageQuery,
+    SearchQuery,
+)
+from metadata_service.api.response_cache import cached_response
 from metadata_service.domain import metadata
 from metadata_service.domain.version import Version
+from metadata_service.exceptions.exceptions import RequestValidationException
 
 logger = logging.getLogger()
 metadata_api = Blueprint("metadata_api", __name__)
@@ -16,7 +32,11 @@ metadata_api = Blueprint("metadata_api", __name__)
 def get_data_store():
     logger.info("GET /metadata/data-store")
 
-    response = jsonify(metadata.find_all_datastore_versions())
+    response = cached_response(
+        ("data-store",),
+        metadata.find_datastore_validator(),
+        metadata.find_all_datastore_versions,
+    )
     response.headers.set("content-language", "no")
     return response
 
@@ -26,9 +46,12 @@ def get_data_store():
 def get_data_structure_current_status(query: NameParam):
     logger.info(
         f"GET /metadata/data-structures/status with name = {query.names}"
+        f" and at = {query.at}"
     )
-    response = jsonify(
-        metadata.find_current_data_structure_status(query.get_names_as_list())
+    response = encoded_response(
+        metadata.find_current_data_structure_status(
+            query.get_names_as_list(), query.at
+        )
     )
     response.headers.set("content-language", "no")
     return response
@@ -39,9 +62,12 @@ def get_data_structure_current_status(query: NameParam):
 def get_data_structure_current_status_as_post(body: NameParam):
     logger.info(
         f"POST /metadata/data-structures/status with name = {body.names}"
+        f" and at = {body.at}"
     )
-    response = jsonify(
-        metadata.find_current_data_structure_status(body.get_names_as_list())
+    response = encoded_response(
+        metadata.find_current_data_structure_status(
+            body.get_names_as_list(), body.at
+        )
     )
     response.headers.set("content-language", "no")
     return response
@@ -53,13 +79,110 @@ def get_data_structures(query: MetadataQuery):
     query.include_attributes = True
     logger.info(f"GET /metadata/data-structures with query: {query}")
 
-    response = jsonify(
-        metadata.find_data_structures(
+    version = Version(query.version)
+    after = decode_cursor(query.cursor)
+
+    def find():
+        if query.limit is None and after is None:
+            return (
+                metadata.find_data_structures(
+                    query.names,
+                    version,
+                    query.include_attributes,
+                    query.skip_code_lists,
+                    query.fields,
+                ),
+                {},
+            )
+        data_structures, next_after = metadata.find_data_structures_page(
+            version,
             query.names,
-            Version(query.version),
+            query.limit,
+            after,
             query.include_attributes,
             query.skip_code_lists,
+            query.fields,
+        )
+        return data_structures, next_cursor_headers(next_after)
+
+    response = cached_response(
+        (
+            "data-structures",
+            query.version,
+            query.skip_code_lists,
+            tuple(query.names),
+            tuple(sorted(query.fields)),
+            query.limit,
+            after,
+        ),
+        metadata.find_metadata_validator(version),
+        find,
+        stream=query.stream,
+        with_headers=True,
+    )
+    response.headers.set("content-language", "no")
+    return response
+
+
+@metadata_api.post("/metadata/data-structures/batch")
+@validate()
+def get_data_structures_in_versions(body: BatchQuery):
+    logger.info(
+        "POST /metadata/data-structures/batch with versions: "
+        f"{[item.version for item in body.requests]}"
+    )
+
+    data_structures = metadata.find_data_structures_in_versions(
+        [(Version(item.version), item.names) for item in body.requests],
+        body.skip_code_lists,
+        body.fields,
+    )
+    response = encoded_response(
+        [
+            {"version": item.version, "dataStructures": found}
+            for item, found in zip(body.requests, data_structures)
+        ]
+    )
+    response.headers.set("content-language", "no")
+    return response
+
+
+@metadata_api.get("/metadata/data-structures/code-list")
+@validate()
+def get_code_list(query: CodeListQuery):
+    logger.info(f"GET /metadata/data-structures/code-list with query: {query}")
+
+    version = Version(query.version)
+    offset = decode_offset_cursor(query.cursor)
+
+    def find():
+        entries, next_offset = metadata.find_code_list(
+            version,
+            query.name,
+            query.variable,
+            query.code,
+            query.prefix,
+            query.limit,
+            offset,
+        )
+        return entries, next_cursor_headers(
+            None if next_offset is None else str(next_offset)
         )
+
+    response = cached_response(
+        (
+            "code-list",
+            query.version,
+            query.name,
+            query.variable,
+            query.code,
+            query.prefix,
+            query.limit,
+            offset,
+        ),
+        metadata.find_metadata_validator(version),
+        find,
+        with_headers=True,
     )
     response.headers.set("content-language", "no")
     return response
@@ -67,10 +190,30 @@ def get_data_structures(query: MetadataQuery):
 
 @metadata_api.get("/metadata/all-data-structures")
 @validate()
-def get_all_data_structures_ever():
-    logger.info("GET /metadata/all-data-structures")
+def get_all_data_structures_ever(query: PageQuery):
+    logger.info(f"GET /metadata/all-data-structures with query: {query}")
+
+    after = decode_cursor(query.cursor)
+    if query.limit is None and after is None:
+        response = cached_response(
+            ("all-data-structures",),
+            metadata.find_datastore_validator(),
+            metadata.find_all_data_structures_ever,
+        )
+    else:
+
+        def find():
+            names, next_after = metadata.find_all_data_structures_ever_page(
+                query.limit, after
+            )
+            return names, next_cursor_headers(next_after)
 
-    response = jsonify(metadata.find_all_data_structures_ever())
+        response = cached_response(
+            ("all-data-structures", query.limit, after),
+            metadata.find_datastore_validator(),
+            find,
+            with_headers=True,
+        )
     response.headers.set("content-language", "no")
     return response
 
@@ -79,11 +222,62 @@ def get_all_data_structures_ever():
 @validate()
 def get_all_metadata(query: MetadataQuery):
     logger.info(f"GET /metadata/all with version: {query.version}")
-
-    response = jsonify(
-        metadata.find_all_metadata(
-            Version(query.version), query.skip_code_lists
+    if query.limit is not None or query.cursor is not None:
+        raise RequestValidationException(
+            "limit and cursor are only supported by /metadata/data-structures"
+            " and /metadata/all-data-structures"
         )
+
+    version = Version(query.version)
+    response = cached_response(
+        (
+            "all",
+            query.version,
+            query.skip_code_lists,
+            tuple(sorted(query.fields)),
+        ),
+        metadata.find_metadata_validator(version),
+        lambda: metadata.find_all_metadata(
+            version, query.skip_code_lists, query.fields
+        ),
+        stream=query.stream,
+    )
+    response.headers.set("content-language", "no")
+    return response
+
+
+@metadata_api.get("/metadata/search")
+@validate()
+def search_data_structures(query: SearchQuery):
+    logger.info(f"GET /metadata/search with query: {query}")
+
+    version = Version(query.version)
+    response = cached_response(
+        ("search", query.version, query.q, query.limit),
+        metadata.find_metadata_validator(version),
+        lambda: metadata.find_data_structures_matching(
+            version, query.q, query.limit
+        ),
+    )
+    response.headers.set("content-language", "no")
+    return response
+
+
+@metadata_api.get("/metadata/diff")
+@validate()
+def get_version_diff(query: DiffQuery):
+    logger.info(f"GET /metadata/diff with query: {query}")
+
+    from_version = Version(query.from_version)
+    to_version = Version(query.to_version)
+    response = cached_response(
+        ("diff", query.from_version, query.to_version),
+        metadata.find_version_diff_validator(from_version, to_version),
+        lambda: {
+            "fromVersion": query.from_version,
+            "toVersion": query.to_version,
+            **metadata.find_version_diff(from_version, to_version),
+        },
     )
     response.headers.set("content-language", "no")
     return response
@@ -94,5 +288,5 @@ def get_all_metadata(query: MetadataQuery):
 def get_languages():
     logger.info("GET /languages")
 
-    response = jsonify(metadata.find_languages())
+    response = encoded_response(metadata.find_languages())
     return response
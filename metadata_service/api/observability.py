@@ -1,9 +1,50 @@
-from flask import Blueprint
+from time import perf_counter
+
+from flask import Blueprint, Response, g, request
+
+from metadata_service.adapter import metrics
 
 
 observability = Blueprint("observability", __name__)
 
 
+@observability.before_app_request
+def start_timer():
+    g.metrics_start_time = perf_counter()
+
+
+@observability.after_app_request
+def record_metrics(response: Response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.inc(
+        "http_requests_total",
+        {
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+        },
+    )
+    if "metrics_start_time" in g:
+        metrics.observe(
+            "http_request_duration_seconds",
+            {"method": request.method, "route": route},
+            perf_counter() - g.metrics_start_time,
+        )
+    if response.content_length is not None:
+        metrics.observe(
+            "http_response_size_bytes",
+            {
+                "route": route,
+                "format": response.mimetype,
+                "encoding": response.content_encoding or "identity",
+            },
+            response.content_length,
+            metrics.SIZE_BUCKETS,
+        )
+    metrics.flush()
+    return response
+
+
 @observability.get("/health/alive")
 def alive():
     return "I'm alive!"
@@ -12,3 +53,11 @@ def alive():
 @observability.get("/health/ready")
 def ready():
     return "I'm ready!"
+
+
+@observability.get("/metrics")
+def get_metrics():
+    return Response(
+        metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,41 @@
+import base64
+import binascii
+import re
+from typing import Optional
+
+from metadata_service.exceptions.exceptions import RequestValidationException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_REG_EXP = re.compile(r"^[A-Za-z0-9_-]+={0,2}$")
+
+
+def encode_cursor(after: str) -> str:
+    return base64.urlsafe_b64encode(after.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Returns the name that the cursor continues after."""
+    if cursor is None:
+        return None
+    if not CURSOR_REG_EXP.match(cursor):
+        raise RequestValidationException(f"Invalid cursor: {cursor}")
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise RequestValidationException(f"Invalid cursor: {cursor}") from e
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """Returns the position that the cursor continues from."""
+    after = decode_cursor(cursor)
+    if after is None:
+        return 0
+    if not after.isdigit():
+        raise RequestValidationException(f"Invalid cursor: {cursor}")
+    return int(after)
+
+
+def next_cursor_headers(next_after: Optional[str]) -> dict[str, str]:
+    if next_after is None:
+        return {}
+    return {NEXT_CURSOR_HEADER: encode_cursor(next_after)}
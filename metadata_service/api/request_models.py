@@ -1,13 +1,16 @@
 import re
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, field_validator, model_validator
 
 from metadata_service.exceptions.exceptions import RequestValidationException
 
 SEMVER_4_PARTS_REG_EXP = re.compile(
     r"^([0-9]+)\.([0-9]+)\.([0-9]+)\.([0-9]+)$"
 )
+FIELD_PATH_REG_EXP = re.compile(r"^[A-Za-z]+(\.[A-Za-z]+)*$")
+MAX_BATCH_SIZE = 100
+MAX_SEARCH_LIMIT = 100
 
 
 class MetadataQuery(BaseModel, extra="forbid", validate_assignment=True):
@@ -15,6 +18,10 @@ class MetadataQuery(BaseModel, extra="forbid", validate_assignment=True):
     version: str
     include_attributes: bool = False
     skip_code_lists: bool = False
+    stream: bool = False
+    fields: List[str] = []
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
 
     @field_validator("names", mode="before")
     @classmethod
@@ -28,19 +35,174 @@ class MetadataQuery(BaseModel, extra="forbid", validate_assignment=True):
                 "names field must be a list or a string"
             )
 
+    @field_validator("fields", mode="before")
+    @classmethod
+    def validate_fields(cls, fields):
+        return _validate_fields(fields)
+
+    @field_validator("limit")
+    @classmethod
+    def validate_limit(cls, limit: Optional[int]):
+        return _validate_limit(limit)
+
+    @field_validator("version", mode="before")
+    @classmethod
+    def validate_version(cls, version: str):
+        return _validate_version(version)
+
+
+def _validate_fields(fields) -> List[str]:
+    if isinstance(fields, List):
+        fields = ",".join(fields)
+    if not isinstance(fields, str):
+        raise RequestValidationException(
+            "fields field must be a list or a string"
+        )
+    fields = [field for field in fields.split(",") if field]
+    for field in fields:
+        if not FIELD_PATH_REG_EXP.match(field):
+            raise RequestValidationException(
+                f"Field is in incorrect format: {field}. "
+                "Should be keys separated by dots, "
+                "e.g. measureVariable.dataType"
+            )
+    return fields
+
+
+def _validate_version(version: str) -> str:
+    if not SEMVER_4_PARTS_REG_EXP.match(version):
+        raise RequestValidationException(
+            f"Version is in incorrect format: {version}. "
+            "Should consist of 4 parts, e.g. 1.0.0.0"
+        )
+    return version
+
+
+def _validate_limit(limit: Optional[int]) -> Optional[int]:
+    if limit is not None and limit < 1:
+        raise RequestValidationException(
+            f"limit must be a positive number, got {limit}"
+        )
+    return limit
+
+
+class PageQuery(BaseModel, extra="forbid"):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+
+    @field_validator("limit")
+    @classmethod
+    def validate_limit(cls, limit: Optional[int]):
+        return _validate_limit(limit)
+
+
+class DiffQuery(BaseModel, extra="forbid"):
+    from_version: str
+    to_version: str
+
+    @field_validator("from_version", "to_version", mode="before")
+    @classmethod
+    def validate_version(cls, version: str):
+        return _validate_version(version)
+
+
+class SearchQuery(BaseModel, extra="forbid"):
+    version: str
+    q: str
+    limit: int = 20
+
+    @field_validator("version", mode="before")
+    @classmethod
+    def validate_version(cls, version: str):
+        return _validate_version(version)
+
+    @field_validator("q")
+    @classmethod
+    def validate_q(cls, q: str):
+        if not q.strip():
+            raise RequestValidationException("q must not be empty")
+        return q
+
+    @field_validator("limit")
+    @classmethod
+    def validate_limit(cls, limit: int):
+        if not 0 < limit <= MAX_SEARCH_LIMIT:
+            raise RequestValidationException(
+                f"limit must be between 1 and {MAX_SEARCH_LIMIT}, got {limit}"
+            )
+        return limit
+
+
+class CodeListQuery(BaseModel, extra="forbid"):
+    version: str
+    name: str
+    variable: Optional[str] = None
+    code: Optional[str] = None
+    prefix: Optional[str] = None
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+
     @field_validator("version", mode="before")
     @classmethod
     def validate_version(cls, version: str):
-        if not SEMVER_4_PARTS_REG_EXP.match(version):
+        return _validate_version(version)
+
+    @field_validator("limit")
+    @classmethod
+    def validate_limit(cls, limit: Optional[int]):
+        return _validate_limit(limit)
+
+    @model_validator(mode="after")
+    def validate_code_or_prefix(self):
+        if self.code is not None and self.prefix is not None:
             raise RequestValidationException(
-                f"Version is in incorrect format: {version}. "
-                "Should consist of 4 parts, e.g. 1.0.0.0"
+                "code and prefix can not be combined"
             )
-        return version
+        return self
 
 
 class NameParam(BaseModel, extra="forbid"):
     names: str
+    at: Optional[int] = None
 
     def get_names_as_list(self) -> List[str]:
         return self.names.split(",")
+
+
+class BatchItem(BaseModel, extra="forbid"):
+    version: str
+    names: List[str] = []
+
+    @field_validator("version", mode="before")
+    @classmethod
+    def validate_version(cls, version: str):
+        return _validate_version(version)
+
+    @model_validator(mode="after")
+    def validate_names(self):
+        # Without names a single item would return the whole version
+        if not self.names:
+            raise RequestValidationException(
+                f"names are required for version {self.version}"
+            )
+        return self
+
+
+class BatchQuery(BaseModel, extra="forbid"):
+    requests: List[BatchItem]
+    skip_code_lists: bool = False
+    fields: List[str] = []
+
+    @field_validator("requests")
+    @classmethod
+    def validate_requests(cls, requests: List[BatchItem]):
+        if not 0 < len(requests) <= MAX_BATCH_SIZE:
+            raise RequestValidationException(
+                f"requests must hold between 1 and {MAX_BATCH_SIZE} items"
+            )
+        return requests
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def validate_fields(cls, fields):
+        return _validate_fields(fields)
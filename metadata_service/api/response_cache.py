@@ -0,0 +1,190 @@
+import hashlib
+from typing import Any, Callable, Hashable, Optional
+
+from flask import Response, request
+
+from metadata_service.adapter import metrics
+from metadata_service.adapter.cache import LRUCache, cache_samples
+from metadata_service.adapter.datastore import CacheValidator
+from metadata_service.api.compression import (
+    MIN_COMPRESS_BYTES,
+    compress,
+    negotiate_encoding,
+)
+from metadata_service.api.content_negotiation import (
+    body_response,
+    encode,
+    encode_chunks,
+    request_media_type,
+)
+from metadata_service.config import environment
+
+response_cache = LRUCache(int(environment.get("RESPONSE_CACHE_MAX_BYTES")))
+metrics.register_collector(lambda: cache_samples("response", response_cache))
+
+
+def cached_response(
+    key: Hashable,
+    validator: Optional[CacheValidator],
+    find: Callable[[], Any],
+    stream: bool = False,
+    with_headers: bool = False,
+) -> Response:
+    """
+    Responds with the result of find() encoded in the negotiated format
+    and content encoding, reusing the bodies from an earlier request as
+    long as the underlying datastore files are unchanged. Conditional
+    requests that match the ETag or Last-Modified of those files get a
+    304 without calling find(). The ETag also depends on the content
+    encoding the body is sent with.
+    When stream is set, a body that is not cached is sent uncompressed
+    in chunks as it is encoded, and is not cached.
+    When with_headers is set, find() returns the payload together with
+    a dict of response headers, such as the cursor of the next page,
+    which are cached along with the body.
+    """
+    if not with_headers:
+        find = _without_headers(find)
+    media_type = request_media_type()
+    key = (key, media_type)
+    if validator is None:
+        return _encoded_response(find, media_type, stream)
+
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    etags = [
+        _etag(validator, key, sent_encoding)
+        for sent_encoding in _sent_encodings(
+            key, validator.signature, encoding, stream
+        )
+    ]
+    not_modified, etag = _not_modified(etags, validator.last_modified)
+    if not_modified:
+        response = Response(status=304)
+        response.vary.update(["Accept", "Accept-Encoding"])
+    else:
+        response = _cached_body_response(
+            key, validator.signature, find, media_type, encoding, stream
+        )
+        etag = _etag(validator, key, response.content_encoding)
+    if etag is not None:
+        response.set_etag(etag)
+    response.last_modified = validator.last_modified
+    return response
+
+
+def _etag(
+    validator: CacheValidator, key: Hashable, content_encoding: Optional[str]
+) -> str:
+    return hashlib.sha256(
+        f"{validator.digest}{key!r}{content_encoding}".encode()
+    ).hexdigest()
+
+
+def _sent_encodings(
+    key: Hashable,
+    signature: Hashable,
+    encoding: Optional[str],
+    stream: bool,
+) -> list[Optional[str]]:
+    """
+    Returns the content encodings the body may be sent with: the
+    negotiated one, or none for streamed and small bodies. Before a body
+    is cached its size is unknown, so both are possible.
+    """
+    if encoding is None:
+        return [None]
+    if response_cache.peek((key, encoding), signature) is not None:
+        return [encoding]
+    entry = response_cache.peek(key, signature)
+    if entry is not None:
+        body, _ = entry.value
+        return [encoding if len(body) >= MIN_COMPRESS_BYTES else None]
+    if stream:
+        return [None]
+    return [encoding, None]
+
+
+def _cached_body_response(
+    key: Hashable,
+    signature: Hashable,
+    find: Callable[[], Any],
+    media_type: str,
+    encoding: Optional[str],
+    stream: bool,
+) -> Response:
+    if encoding is not None:
+        entry = response_cache.lookup((key, encoding), signature)
+        if entry is not None:
+            compressed, headers = entry.value
+            response = body_response(compressed, media_type)
+            response.headers.update(headers)
+            response.content_encoding = encoding
+            response.vary.add("Accept-Encoding")
+            return response
+
+    entry = response_cache.lookup(key, signature)
+    if entry is not None:
+        body, headers = entry.value
+    elif stream:
+        return _encoded_response(find, media_type, stream)
+    else:
+        payload, headers = find()
+        with metrics.timed("response_encode_seconds", {"format": media_type}):
+            body = encode(payload, media_type)
+        response_cache.store(key, signature, (body, headers), len(body))
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        response = body_response(body, media_type)
+    else:
+        with metrics.timed(
+            "response_compress_seconds", {"encoding": encoding}
+        ):
+            compressed = compress(body, encoding)
+        response_cache.store(
+            (key, encoding),
+            signature,
+            (compressed, headers),
+            len(compressed),
+        )
+        response = body_response(compressed, media_type)
+        response.content_encoding = encoding
+    response.headers.update(headers)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _without_headers(find: Callable[[], Any]) -> Callable[[], tuple]:
+    return lambda: (find(), {})
+
+
+def _encoded_response(
+    find: Callable[[], tuple], media_type: str, stream: bool
+) -> Response:
+    payload, headers = find()
+    if stream:
+        response = body_response(
+            encode_chunks(payload, media_type), media_type
+        )
+    else:
+        response = body_response(encode(payload, media_type), media_type)
+    response.headers.update(headers)
+    return response
+
+
+def _not_modified(
+    etags: list[str], last_modified: float
+) -> tuple[bool, Optional[str]]:
+    """
+    Returns whether the client's copy is current, and the ETag of that
+    copy if it is known.
+    """
+    if request.if_none_match:
+        for etag in etags:
+            if request.if_none_match.contains_weak(etag):
+                return True, etag
+        return False, None
+    if request.if_modified_since is not None:
+        return (
+            int(last_modified) <= request.if_modified_since.timestamp(),
+            etags[0] if len(etags) == 1 else None,
+        )
+    return False, None
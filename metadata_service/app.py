@@ -1,12 +1,15 @@
 import logging
 
-import msgpack
-from flask import Flask, Response, request, jsonify, make_response
+from flask import Flask
 from werkzeug.exceptions import NotFound, BadHost
 
+from metadata_service.api.content_negotiation import encoded_response
 from metadata_service.api.metadata_api import metadata_api
 from metadata_service.api.observability import observability
+from metadata_service.config import environment
 from metadata_service.config.logging import setup_logging
+from metadata_service.config.profiling import setup_profiling
+from metadata_service.domain import metadata
 from metadata_service.exceptions.exceptions import (
     DataNotFoundException,
     InvalidStorageFormatException,
@@ -22,27 +25,17 @@ app.register_blueprint(observability)
 app.register_blueprint(metadata_api)
 
 setup_logging(app)
+setup_profiling(app)
 
-
-@app.after_request
-def after_request(response: Response):
-    if (
-        "Accept" in request.headers
-        and request.headers["Accept"] == "application/x-msgpack"
-    ):
-        # create a new Response to send the payload only as "data" field
-        response_msgpack = make_response(msgpack.dumps(response.json))
-        response_msgpack.headers.set("Content-Type", "application/x-msgpack")
-        return response_msgpack
-
-    return response
+if environment.get("DATASTORE_WATCH") == "true":
+    metadata.watch_datastore()
 
 
 @app.errorhandler(Exception)
 def handle_generic_exception(exc):
     logger.exception(exc)
     return (
-        jsonify(
+        encoded_response(
             {
                 "code": 202,
                 "message": f"Error: {str(exc)}",
@@ -58,7 +51,7 @@ def handle_generic_exception(exc):
 def handle_url_invalid(exc):
     logger.warning(exc, exc_info=True)
     return (
-        jsonify(
+        encoded_response(
             {
                 "code": 103,
                 "message": f"Error: {str(exc)}",
@@ -69,11 +62,12 @@ def handle_url_invalid(exc):
         400,
     )
 
+
 @app.errorhandler(BadHost)
 def handle_bad_host(exc):
     logger.warning(exc, exc_info=True)
     return (
-        jsonify(
+        encoded_response(
             {
                 "code": 103,
                 "message": f"Error: {str(exc)}",
@@ -88,7 +82,7 @@ def handle_bad_host(exc):
 @app.errorhandler(DataNotFoundException)
 def handle_data_not_found(exc):
     logger.warning(exc, exc_info=True)
-    return jsonify(exc.to_dict()), 404
+    return encoded_response(exc.to_dict()), 404
 
 
 @app.errorhandler(InvalidDraftVersionException)
@@ -100,13 +94,13 @@ def handle_invalid_draft(exc):
 @app.errorhandler(RequestValidationException)
 def handle_invalid_request(exc):
     logger.warning(exc, exc_info=True)
-    return jsonify(exc.to_dict()), 400
+    return encoded_response(exc.to_dict()), 400
 
 
 @app.errorhandler(InvalidStorageFormatException)
 def handle_invalid_format(exc):
     logger.exception(exc)
-    return jsonify(exc.to_dict()), 500
+    return encoded_response(exc.to_dict()), 500
 
 
 # this is needed to run the application in IDE
@@ -0,0 +1,140 @@
+"""
+ASGI entry point serving the same routes, error handlers and response
+formats as the Flask app:
+
+    uvicorn metadata_service.asgi:app
+
+Each request is handled by the Flask app in a thread, and the response
+body is sent from the event loop one chunk at a time. No thread is held
+while a slow client receives a large body, so the number of open
+connections is limited by the ASGI server rather than by worker threads.
+"""
+
+import asyncio
+import io
+import sys
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from metadata_service.app import app as flask_app
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+_DONE = object()
+
+
+def _environ(scope: Scope, body: bytes) -> dict:
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        if key in environ:
+            value = f"{environ[key]},{value}"
+        environ[key] = value
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def _read_body(receive: Receive) -> Optional[bytes]:
+    """Returns the request body, or None if the client disconnected."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _call_wsgi(environ: dict) -> tuple[str, list, Iterable[bytes]]:
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = status
+        response["headers"] = headers
+        return lambda data: response.setdefault("written", []).append(data)
+
+    body = flask_app(environ, start_response)
+    if "written" in response:
+        body = [*response["written"], *body]
+    return response["status"], response["headers"], body
+
+
+async def _handle_http(scope: Scope, receive: Receive, send: Send) -> None:
+    body = await _read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    status, headers, chunks = await loop.run_in_executor(
+        None, _call_wsgi, _environ(scope, body)
+    )
+    await send(
+        {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ],
+        }
+    )
+    iterator = iter(chunks)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, iterator, _DONE)
+            if chunk is _DONE:
+                break
+            if chunk:
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(chunks, "close"):
+            await loop.run_in_executor(None, chunks.close)
+
+
+async def _handle_lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "http":
+        await _handle_http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await _handle_lifespan(receive, send)
+    else:
+        raise NotImplementedError(f"Unsupported scope type {scope['type']}")
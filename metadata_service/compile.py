@@ -0,0 +1,71 @@
+"""
+Compiles every metadata_all__*.json in a datastore into the indexed
+binary format read by the datastore adapter:
+
+    python -m metadata_service.compile [DATASTORE_ROOT_DIR] [--force]
+"""
+
+import argparse
+import glob
+import logging
+import os
+
+from metadata_service.adapter.compiled_metadata import (
+    CompiledMetadata,
+    compile_metadata_all,
+)
+
+logger = logging.getLogger()
+
+
+def _is_up_to_date(json_file: str, compiled_file: str) -> bool:
+    if not os.path.exists(compiled_file):
+        return False
+    stat = os.stat(json_file)
+    try:
+        return CompiledMetadata(compiled_file).is_compiled_from(
+            stat.st_size, stat.st_mtime_ns
+        )
+    except ValueError:
+        return False
+
+
+def compile_datastore(datastore_root_dir: str, force: bool = False) -> int:
+    compiled_count = 0
+    for json_file in sorted(
+        glob.glob(f"{datastore_root_dir}/datastore/metadata_all__*.json")
+    ):
+        compiled_file = f"{json_file.removesuffix('.json')}.compiled"
+        if not force and _is_up_to_date(json_file, compiled_file):
+            logger.info(f"{compiled_file} is up to date")
+            continue
+        compile_metadata_all(json_file, compiled_file)
+        logger.info(f"Compiled {json_file} to {compiled_file}")
+        compiled_count += 1
+    return compiled_count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile metadata_all files for fast partial reads"
+    )
+    parser.add_argument(
+        "datastore_root_dir",
+        nargs="?",
+        default=os.environ.get("DATASTORE_ROOT_DIR"),
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="compile files that are already up to date",
+    )
+    args = parser.parse_args()
+    if args.datastore_root_dir is None:
+        parser.error("DATASTORE_ROOT_DIR is not set")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    compiled_count = compile_datastore(args.datastore_root_dir, args.force)
+    logger.info(f"Compiled {compiled_count} file(s)")
+
+
+if __name__ == "__main__":
+    main()
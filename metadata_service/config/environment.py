@@ -6,6 +6,20 @@ def _initialize_environment() -> dict:
         "DATASTORE_ROOT_DIR": os.environ["DATASTORE_ROOT_DIR"],
         "DOCKER_HOST_NAME": os.environ["DOCKER_HOST_NAME"],
         "COMMIT_ID": os.environ["COMMIT_ID"],
+        "METADATA_CACHE_MAX_BYTES": os.environ.get(
+            "METADATA_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)
+        ),
+        "RESPONSE_CACHE_MAX_BYTES": os.environ.get(
+            "RESPONSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)
+        ),
+        "DATASTORE_WATCH": os.environ.get("DATASTORE_WATCH", "false"),
+        "DATASTORE_WATCH_INTERVAL": os.environ.get(
+            "DATASTORE_WATCH_INTERVAL", "2"
+        ),
+        "LOG_QUEUE_SIZE": os.environ.get("LOG_QUEUE_SIZE", "10000"),
+        "METRICS_DIR": os.environ.get("METRICS_DIR", ""),
+        "PROFILE_DIR": os.environ.get("PROFILE_DIR", ""),
+        "PROFILE_SAMPLE_RATE": os.environ.get("PROFILE_SAMPLE_RATE", "0"),
     }
 
 
@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration that loads and indexes all released versions once
+in the master process, before the workers are forked. The loaded objects
+are moved to the permanent generation with gc.freeze(), so that garbage
+collection in the workers does not write to the pages shared with the
+master.
+
+    gunicorn --config python:metadata_service.config.gunicorn_conf \\
+        metadata_service.app:app
+"""
+
+import gc
+import math
+import os
+import tempfile
+from typing import Optional
+
+
+def _cgroup_cpu_limit() -> Optional[int]:
+    """Returns the CPU quota of the container rounded up, if it has one."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as f:
+            quota, period = f.read().split()
+    except OSError:
+        try:
+            with open(
+                "/sys/fs/cgroup/cpu/cpu.cfs_quota_us", encoding="utf-8"
+            ) as f:
+                quota = f.read().strip()
+            with open(
+                "/sys/fs/cgroup/cpu/cpu.cfs_period_us", encoding="utf-8"
+            ) as f:
+                period = f.read().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    return math.ceil(int(quota) / int(period))
+
+
+def _available_cpus() -> int:
+    # os.cpu_count() counts the CPUs of the host, not the ones this
+    # container may use
+    cpus = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count() or 1
+    )
+    limit = _cgroup_cpu_limit()
+    return max(1, cpus if limit is None else min(cpus, limit))
+
+
+preload_app = True
+workers = int(os.environ.get("GUNICORN_WORKERS", _available_cpus()))
+
+# Each worker keeps its own metrics, so /metrics only reports all of them
+# when they are added up through files in a shared directory
+if workers > 1 and not os.environ.get("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(
+        prefix="metadata-service-metrics-"
+    )
+logger_class = "metadata_service.config.gunicorn.CustomLogger"
+limit_request_line = 8190
+
+
+# A background thread in the master could hold a lock while the workers
+# are forked, leaving it held for good in the worker. The app therefore
+# does not start the datastore watcher in the master, and each worker
+# starts its own after the fork.
+watch_datastore = os.environ.get("DATASTORE_WATCH") == "true"
+os.environ["DATASTORE_WATCH"] = "false"
+
+
+def post_fork(server, worker):
+    if watch_datastore:
+        from metadata_service.domain import metadata
+
+        metadata.watch_datastore()
+
+
+def when_ready(server):
+    from metadata_service.adapter import metrics
+    from metadata_service.domain import metadata
+
+    metrics.clear_directory()
+
+    cached = metadata.preload_released_versions()
+    server.log.info(f"Preloaded {cached} released versions")
+    gc.freeze()
@@ -1,35 +1,52 @@
+import os
 import re
 import sys
+import time
 import uuid
 import json
+import queue
+import atexit
 import logging
-import datetime
+import logging.handlers
 from time import perf_counter_ns
 
 from flask import request, g, has_request_context
 
+from metadata_service.adapter import metrics
 from metadata_service.config import environment
 
+_INVALID_REQUEST_ID_CHARACTERS = re.compile(r"[^\w\-]")
+STOP_TIMEOUT_SECONDS = 5
+
 
 class MicrodataJSONFormatter(logging.Formatter):
     def __init__(self):
         self.host = environment.get("DOCKER_HOST_NAME")
         self.command = json.dumps(sys.argv)
         self.commit_id = environment.get("COMMIT_ID")
+        self._second = None
+        self._second_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_prefix = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.gmtime(second)
+            )
+        return f"{self._second_prefix}.{int(created % 1 * 1000):03d}Z"
 
     def format(self, record: logging.LogRecord) -> str:
-        flask_context = _get_flask_context()
-        stack_trace = ""
+        flask_context = getattr(record, "flask_context", None)
+        if flask_context is None:
+            flask_context = _get_flask_context()
+        stack_trace = record.exc_text or ""
         if record.exc_info is not None:
             stack_trace = self.formatException(record.exc_info)
 
         return json.dumps(
             {
-                "@timestamp": datetime.datetime.fromtimestamp(
-                    record.created,
-                    tz=datetime.timezone.utc,
-                ).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
-                + "Z",
+                "@timestamp": self._timestamp(record.created),
                 "command": self.command,
                 "error.stack": stack_trace,
                 "host": self.host,
@@ -46,8 +63,8 @@ class MicrodataJSONFormatter(logging.Formatter):
                 "statusCode": flask_context["response_status"],
                 "thread": record.threadName,
                 "url": flask_context["request_url"],
-                "xRequestId": re.sub(
-                    r"[^\w\-]", "", flask_context["x_request_id"]
+                "xRequestId": _INVALID_REQUEST_ID_CHARACTERS.sub(
+                    "", flask_context["x_request_id"]
                 ),
             }
         )
@@ -80,13 +97,97 @@ def _get_flask_context():
     return flask_context
 
 
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a bounded queue for a QueueListener to format and
+    write. The flask context is read here, on the request thread, and
+    records are dropped and counted when the queue is full.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.flask_context = _get_flask_context()
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info is not None:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("log_records_dropped_total", {})
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    Writes every record still on the queue before stopping. Stopping
+    waits up to STOP_TIMEOUT_SECONDS for room on a full queue, and
+    raises queue.Full if the listener does not make any.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel, timeout=STOP_TIMEOUT_SECONDS)
+
+
+def _start_listener(
+    queue_handler: BoundedQueueHandler, handler: logging.Handler
+) -> DrainingQueueListener:
+    listener = DrainingQueueListener(queue_handler.queue, handler)
+    listener.start()
+    return listener
+
+
 def setup_logging(app, log_level: int = logging.INFO) -> None:
     logger = logging.getLogger()
     logger.setLevel(log_level)
     formatter = MicrodataJSONFormatter()
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    queue_handler = BoundedQueueHandler(int(environment.get("LOG_QUEUE_SIZE")))
+    logger.addHandler(queue_handler)
+    listener = _start_listener(queue_handler, stream_handler)
+
+    def stop_listener():
+        try:
+            listener.stop()
+        except queue.Full:
+            # Stuck writing to stdout; at exit the records still queued
+            # are lost
+            print(
+                "The log listener did not stop, with "
+                f"{queue_handler.queue.qsize()} records queued",
+                file=sys.stderr,
+            )
+
+    def start_listener():
+        nonlocal listener
+        listener = _start_listener(queue_handler, stream_handler)
+
+    def restart_listener_in_child():
+        # Other threads of the parent may have held the queue's lock
+        # during the fork, so the child starts with a new queue
+        queue_handler.queue = queue.Queue(queue_handler.queue.maxsize)
+        start_listener()
+
+    atexit.register(stop_listener)
+    # The listener thread could be writing to stdout when the process
+    # forks, leaving the locks it holds locked for good in the child, so
+    # it is stopped before the fork and started again in both processes
+    os.register_at_fork(
+        before=stop_listener,
+        after_in_parent=start_listener,
+        after_in_child=restart_listener_in_child,
+    )
 
     @app.before_request
     def before_request():
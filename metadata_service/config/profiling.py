@@ -0,0 +1,98 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+
+from flask import g, request
+
+from metadata_service.config import environment
+
+PROFILE_HEADER = "X-Profile"
+
+logger = logging.getLogger()
+
+
+class RequestCounter:
+    """Counts the requests of this process, started and in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.in_flight = 0
+
+    def start(self) -> tuple[int, int]:
+        """Returns the number of started and in flight requests."""
+        with self._lock:
+            self.started += 1
+            self.in_flight += 1
+            return self.started, self.in_flight
+
+    def finish(self) -> int:
+        """Returns the number of started requests."""
+        with self._lock:
+            self.in_flight -= 1
+            return self.started
+
+
+def _should_profile(sample_rate: float) -> bool:
+    if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true"):
+        return True
+    return random.random() < sample_rate
+
+
+def _profile_path(profile_dir: str) -> str:
+    file_name = re.sub(r"[^\w\-]", "", g.correlation_id) or "unknown"
+    return os.path.join(profile_dir, f"{file_name}.prof")
+
+
+def setup_profiling(app) -> None:
+    """
+    Profiles a sample of requests with cProfile when PROFILE_DIR is set.
+    PROFILE_SAMPLE_RATE is the fraction of requests to profile, and
+    requests with the X-Profile: true header are always profiled. Each
+    profile is written to PROFILE_DIR/<X-Request-ID>.prof. Must be set up
+    after logging, which assigns the request id.
+    Since Python 3.12 cProfile records every thread of the process, so
+    the profile of a request also holds the calls of the requests that
+    ran at the same time. Their number is logged with the profile.
+    """
+    profile_dir = environment.get("PROFILE_DIR")
+    if not profile_dir:
+        return
+    sample_rate = float(environment.get("PROFILE_SAMPLE_RATE"))
+    os.makedirs(profile_dir, exist_ok=True)
+    requests = RequestCounter()
+
+    @app.before_request
+    def start_profile():
+        started, in_flight = requests.start()
+        g.counted = True
+        if not _should_profile(sample_rate):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Only one profiler can be active at a time
+            return
+        g.profile = profile
+        # Requests running now, and started later, overlap the profile
+        g.overlapping_requests = in_flight - 1 - started
+
+    @app.teardown_request
+    def stop_profile(exc):
+        if not g.pop("counted", False):
+            return
+        started = requests.finish()
+        profile = g.pop("profile", None)
+        if profile is None:
+            return
+        profile.disable()
+        profile_path = _profile_path(profile_dir)
+        profile.dump_stats(profile_path)
+        logger.info(
+            f"Wrote profile to {profile_path}, overlapping "
+            f"{g.pop('overlapping_requests') + started} other requests"
+        )
@@ -0,0 +1,82 @@
+import sys
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CodeListIndex:
+    """
+    The code list entries of all represented variables of a variable,
+    each with the valid period of its represented variable, and
+    lookups by code and by category label.
+    """
+
+    entries: list[tuple[dict, dict]]
+    positions_by_code: dict[str, list[int]]
+    sorted_labels: list[str]
+    label_positions: list[int]
+
+
+def _normalize(label: str) -> str:
+    return unicodedata.normalize("NFKC", label).casefold()
+
+
+def build_index(variable: dict) -> Optional[CodeListIndex]:
+    """Returns None if the variable has no code list."""
+    entries = [
+        (code_item, represented.get("validPeriod", {}))
+        for represented in variable["representedVariables"]
+        for code_item in represented["valueDomain"].get("codeList") or []
+    ]
+    if not entries:
+        return None
+    positions_by_code: dict[str, list[int]] = {}
+    for position, (code_item, _) in enumerate(entries):
+        positions_by_code.setdefault(code_item["code"], []).append(position)
+    labels = sorted(
+        (_normalize(code_item.get("category", "")), position)
+        for position, (code_item, _) in enumerate(entries)
+    )
+    return CodeListIndex(
+        entries,
+        positions_by_code,
+        [label for label, _ in labels],
+        [position for _, position in labels],
+    )
+
+
+def page(
+    index: CodeListIndex,
+    code: Optional[str],
+    prefix: Optional[str],
+    limit: Optional[int],
+    offset: int,
+) -> tuple[list[dict], Optional[int]]:
+    """
+    Returns one page of the entries with the given code, of the entries
+    whose category starts with prefix in label order, or of all entries
+    in code list order, together with the offset of the next page, or
+    None for the last page.
+    """
+    if code is not None:
+        positions = index.positions_by_code.get(code, [])
+        start, stop = 0, len(positions)
+    elif prefix is not None:
+        positions = index.label_positions
+        prefix = _normalize(prefix)
+        start = bisect_left(index.sorted_labels, prefix)
+        stop = bisect_left(index.sorted_labels, prefix + chr(sys.maxunicode))
+    else:
+        positions = range(len(index.entries))
+        start, stop = 0, len(index.entries)
+    first = start + offset
+    last = stop if limit is None else min(stop, first + limit)
+    found = [
+        {**code_item, "validPeriod": valid_period}
+        for code_item, valid_period in (
+            index.entries[position] for position in positions[first:last]
+        )
+    ]
+    return found, last - start if found and last < stop else None
@@ -0,0 +1,102 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+# Lists of items with one of these keys are matched item by item on
+# that key, e.g. variables on name, code list entries on code and
+# represented variables on the start of their valid period. Other lists
+# of items are matched by position
+ITEM_KEYS = ("name", "code", "validPeriod.start")
+
+
+def content_hash(value: Any) -> str:
+    return hashlib.blake2b(
+        json.dumps(
+            value, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict]:
+    """
+    Returns the changes from old to new as a list of
+    {"path", "from", "to"} for changed values, and of
+    {"path", "added", "removed"} for lists where items were added or
+    removed, with the keys or positions of the items, or the values
+    themselves for lists of plain values.
+    """
+    changes: list[dict] = []
+    _diff(old, new, path, changes)
+    return changes
+
+
+def _diff(old: Any, new: Any, path: str, changes: list[dict]) -> None:
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() | new.keys()):
+            _diff(old.get(key), new.get(key), _join(path, key), changes)
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, changes)
+    else:
+        changes.append({"path": path, "from": old, "to": new})
+
+
+def _diff_list(old: list, new: list, path: str, changes: list[dict]):
+    items = [*old, *new]
+    item_key = _item_key(old, new)
+    if item_key is not None:
+        old_items = {_key_value(item, item_key): item for item in old}
+        new_items = {_key_value(item, item_key): item for item in new}
+        _append_added_removed(path, list(old_items), list(new_items), changes)
+        for key, item in old_items.items():
+            if key in new_items:
+                _diff(item, new_items[key], f"{path}[{key}]", changes)
+    elif all(isinstance(item, dict) for item in items):
+        for position, (old_item, new_item) in enumerate(zip(old, new)):
+            _diff(old_item, new_item, f"{path}[{position}]", changes)
+        _append_added_removed(
+            path, list(range(len(old))), list(range(len(new))), changes
+        )
+    elif all(isinstance(item, (str, int, float)) for item in items) and (
+        set(old) != set(new)
+    ):
+        _append_added_removed(path, old, new, changes)
+    else:
+        changes.append({"path": path, "from": old, "to": new})
+
+
+def _append_added_removed(
+    path: str, old_keys: list, new_keys: list, changes: list[dict]
+) -> None:
+    old_set, new_set = set(old_keys), set(new_keys)
+    added = [key for key in new_keys if key not in old_set]
+    removed = [key for key in old_keys if key not in new_set]
+    if added or removed:
+        changes.append({"path": path, "added": added, "removed": removed})
+
+
+def _key_value(item: dict, key: str) -> Any:
+    for part in key.split("."):
+        item = item.get(part) if isinstance(item, dict) else None
+    return item
+
+
+def _item_key(old: list, new: list) -> Optional[str]:
+    items = [*old, *new]
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for key in ITEM_KEYS:
+        if all(
+            isinstance(_key_value(item, key), (str, int)) for item in items
+        ) and all(
+            len({_key_value(item, key) for item in side}) == len(side)
+            for side in (old, new)
+        ):
+            return key
+    return None
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
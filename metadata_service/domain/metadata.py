@@ -1,88 +1,470 @@
-from itertools import chain
-from typing import List, Union
+import logging
+import threading
+from bisect import bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
 from metadata_service.adapter import datastore
+from metadata_service.domain import code_list
+from metadata_service.domain.diff import content_hash, diff
+from metadata_service.domain.projection import field_tree, project
+from metadata_service.domain.search import SearchIndex, build_index, search
 from metadata_service.domain.version import Version
 from metadata_service.exceptions.exceptions import (
+    DataNotFoundException,
     InvalidStorageFormatException,
     InvalidDraftVersionException,
 )
 
+logger = logging.getLogger()
+
 
 def find_all_datastore_versions():
     draft_version = datastore.get_draft_version()
     datastore_versions = datastore.get_datastore_versions()
 
     if draft_version:
-        datastore_versions["versions"].insert(0, draft_version)
+        return {
+            **datastore_versions,
+            "versions": [draft_version, *datastore_versions["versions"]],
+        }
 
     return datastore_versions
 
 
 def find_current_data_structure_status(
     status_query_names: List[str],
+    at: Optional[int] = None,
 ) -> dict[str, Union[dict, None]]:
-    datastore_versions = find_all_datastore_versions()
-    datastructure_statuses = {}
-    for version in datastore_versions["versions"]:
-        for data_structure in version["dataStructureUpdates"]:
-            if (
-                data_structure["name"] in status_query_names
-                and data_structure["name"] not in datastructure_statuses
-            ):
-                datastructure_statuses[data_structure["name"]] = {
-                    "operation": data_structure["operation"],
-                    "releaseTime": version["releaseTime"],
-                    "releaseStatus": data_structure["releaseStatus"],
-                }
+    if at is not None:
+        return _find_data_structure_status_at(status_query_names, at)
+    draft_statuses = _draft_statuses(datastore.get_draft_version())
+    released_statuses = _released_statuses(datastore.get_datastore_versions())
     return {
-        name: datastructure_statuses.get(name, None)
+        name: draft_statuses.get(name, released_statuses.get(name))
         for name in status_query_names
     }
 
 
+def _find_data_structure_status_at(
+    status_query_names: List[str], at: int
+) -> dict[str, Union[dict, None]]:
+    draft_version = datastore.get_draft_version()
+    draft_statuses = (
+        _draft_statuses(draft_version)
+        if draft_version and draft_version["releaseTime"] <= at
+        else {}
+    )
+    status_histories = _released_status_histories(
+        datastore.get_datastore_versions()
+    )
+    datastructure_statuses = {}
+    for name in status_query_names:
+        if name in draft_statuses:
+            datastructure_statuses[name] = draft_statuses[name]
+        elif name in status_histories:
+            release_times, statuses = status_histories[name]
+            position = bisect_right(release_times, at)
+            datastructure_statuses[name] = (
+                statuses[position - 1] if position > 0 else None
+            )
+        else:
+            datastructure_statuses[name] = None
+    return datastructure_statuses
+
+
 def find_data_structures(
     names: list[str],
     version: Version,
     include_attributes: bool,
     skip_code_lists: bool = False,
+    fields: Optional[list[str]] = None,
+    name_order: bool = False,
 ):
+    """
+    Returns the named data structures, or all when names is empty, in
+    the order of the metadata_all file, or in name order if name_order
+    is set.
+    """
     _validate_version(version)
-    metadata = (
-        datastore.get_metadata_all(version)
-        if not skip_code_lists
-        else find_all_metadata_skip_code_list_and_missing_values(version)
+    compiled = (
+        datastore.get_compiled_data_structures(version, names)
+        if names
+        else None
     )
+    if compiled is not None:
+        matched = (
+            compiled
+            if not skip_code_lists
+            else [
+                _data_structure_without_code_list(data_structure)
+                for data_structure in compiled
+            ]
+        )
+    else:
+        metadata_all = datastore.get_metadata_all(version)
+        metadata = (
+            metadata_all
+            if not skip_code_lists
+            else _skip_code_list_and_missing_values(metadata_all)
+        )
+        if names:
+            positions = datastore.get_derived(
+                metadata_all,
+                "data_structure_positions",
+                _data_structure_positions,
+            )
+            matched = [
+                metadata["dataStructures"][position]
+                for position in sorted(
+                    {positions[name] for name in names if name in positions}
+                )
+            ]
+        else:
+            matched = metadata["dataStructures"]
 
-    if names:
+    if name_order:
+        matched = sorted(
+            matched, key=lambda data_structure: data_structure["name"]
+        )
+    if not include_attributes:
         matched = [
-            ds for ds in metadata["dataStructures"] if ds["name"] in names
+            {
+                key: value
+                for key, value in match.items()
+                if key != "attributeVariables"
+            }
+            for match in matched
         ]
-    else:
-        matched = metadata["dataStructures"]
-
-    for match in matched:
-        if not include_attributes:
-            match.pop("attributeVariables", None)
+    if fields:
+        matched = project(matched, field_tree(fields))
     return matched
 
 
-def find_all_metadata(version: Version, skip_code_lists: bool = False):
+MAX_BATCH_THREADS = 8
+
+
+def find_data_structures_in_versions(
+    requests: list[tuple[Version, list[str]]],
+    skip_code_lists: bool = False,
+    fields: Optional[list[str]] = None,
+) -> list[list[dict]]:
+    """
+    Finds the named data structures for each (version, names) pair, in
+    the order of the requests. The versions are loaded in parallel, and
+    each version is loaded once however often it is requested.
+    """
+    indexes_by_version: dict[str, list[int]] = {}
+    for index, (version, _) in enumerate(requests):
+        _validate_version(version)
+        indexes_by_version.setdefault(str(version), []).append(index)
+
+    def find_for_version(version: str) -> list[tuple[int, list[dict]]]:
+        return [
+            (
+                index,
+                find_data_structures(
+                    requests[index][1],
+                    requests[index][0],
+                    True,
+                    skip_code_lists,
+                    fields,
+                ),
+            )
+            for index in indexes_by_version[version]
+        ]
+
+    results: list[list[dict]] = [[] for _ in requests]
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_BATCH_THREADS, len(indexes_by_version))
+    ) as executor:
+        for found in executor.map(find_for_version, indexes_by_version):
+            for index, data_structures in found:
+                results[index] = data_structures
+    return results
+
+
+def find_data_structure_names_page(
+    version: Version,
+    names: list[str],
+    limit: Optional[int],
+    after: Optional[str],
+) -> tuple[list[str], Optional[str]]:
+    """
+    Returns the names of one page of data structures in name order, of
+    the given names or of all data structures in the version, together
+    with the name that the next page continues after, or None for the
+    last page.
+    """
     _validate_version(version)
+    if names:
+        sorted_names = sorted(set(names))
+    else:
+        sorted_names = datastore.get_derived(
+            datastore.get_metadata_all(version),
+            "sorted_data_structure_names",
+            _sorted_data_structure_names,
+        )
+    return _page(sorted_names, limit, after)
+
+
+def find_data_structures_page(
+    version: Version,
+    names: list[str],
+    limit: Optional[int],
+    after: Optional[str],
+    include_attributes: bool,
+    skip_code_lists: bool = False,
+    fields: Optional[list[str]] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Returns one page of data structures in name order, together with
+    the name that the next page continues after. See
+    find_data_structure_names_page.
+    """
+    page_names, next_after = find_data_structure_names_page(
+        version, names, limit, after
+    )
+    if not page_names:
+        return [], next_after
     return (
-        datastore.get_metadata_all(version)
+        find_data_structures(
+            page_names,
+            version,
+            include_attributes,
+            skip_code_lists,
+            fields,
+            name_order=True,
+        ),
+        next_after,
+    )
+
+
+def find_all_data_structures_ever_page(
+    limit: Optional[int], after: Optional[str]
+) -> tuple[list[str], Optional[str]]:
+    return _page(find_all_data_structures_ever(), limit, after)
+
+
+def find_all_metadata(
+    version: Version,
+    skip_code_lists: bool = False,
+    fields: Optional[list[str]] = None,
+):
+    _validate_version(version)
+    metadata_all = datastore.get_metadata_all(version)
+    metadata = (
+        metadata_all
         if not skip_code_lists
-        else find_all_metadata_skip_code_list_and_missing_values(version)
+        else _skip_code_list_and_missing_values(metadata_all)
+    )
+    if fields:
+        return {
+            **metadata,
+            "dataStructures": project(
+                metadata["dataStructures"], field_tree(fields)
+            ),
+        }
+    return metadata
+
+
+def find_data_structures_matching(
+    version: Version, query: str, limit: int
+) -> list[dict]:
+    """
+    Searches the names, labels, descriptions and code list categories
+    of the data structures in the version, and returns the name, label
+    and score of the best matches.
+    """
+    _validate_version(version)
+    metadata_all = datastore.get_metadata_all(version)
+    data_structures = metadata_all["dataStructures"]
+    return [
+        {
+            "name": data_structures[position]["name"],
+            "label": data_structures[position]
+            .get("measureVariable", {})
+            .get("label"),
+            "score": round(score, 3),
+        }
+        for position, score in search(
+            _search_index(metadata_all), query, limit
+        )
+    ]
+
+
+def find_code_list(
+    version: Version,
+    data_structure_name: str,
+    variable_name: Optional[str],
+    code: Optional[str] = None,
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> tuple[list[dict], Optional[int]]:
+    """
+    Returns one page of the code list of a variable in the data
+    structure, the measure variable unless variable_name is given, and
+    the offset of the next page. See code_list.page.
+    """
+    _validate_version(version)
+    metadata_all = datastore.get_metadata_all(version)
+    positions = datastore.get_derived(
+        metadata_all, "data_structure_positions", _data_structure_positions
+    )
+    if data_structure_name not in positions:
+        raise DataNotFoundException(
+            f"No data structure named {data_structure_name} in version "
+            f"{version}"
+        )
+    data_structure = metadata_all["dataStructures"][
+        positions[data_structure_name]
+    ]
+    if variable_name is None:
+        variable_name = data_structure["measureVariable"]["name"]
+    index = _code_list_index(metadata_all, data_structure, variable_name)
+    if index is None:
+        raise DataNotFoundException(
+            f"No code list for variable {variable_name} in data structure "
+            f"{data_structure_name}"
+        )
+    return code_list.page(index, code, prefix, limit, offset)
+
+
+def find_version_diff(from_version: Version, to_version: Version) -> dict:
+    """
+    Returns the names of the data structures added and removed from
+    from_version to to_version, and the field-level changes of those in
+    both. Data structures with equal content hashes are skipped.
+    """
+    _validate_version(from_version)
+    _validate_version(to_version)
+    from_metadata = datastore.get_metadata_all(from_version)
+    to_metadata = datastore.get_metadata_all(to_version)
+    from_hashes = _data_structure_hashes(from_metadata)
+    to_hashes = _data_structure_hashes(to_metadata)
+    from_positions = datastore.get_derived(
+        from_metadata, "data_structure_positions", _data_structure_positions
+    )
+    to_positions = datastore.get_derived(
+        to_metadata, "data_structure_positions", _data_structure_positions
     )
+    return {
+        "added": sorted(to_hashes.keys() - from_hashes.keys()),
+        "removed": sorted(from_hashes.keys() - to_hashes.keys()),
+        "changed": [
+            {
+                "name": name,
+                "changes": diff(
+                    from_metadata["dataStructures"][from_positions[name]],
+                    to_metadata["dataStructures"][to_positions[name]],
+                ),
+            }
+            for name in sorted(from_hashes.keys() & to_hashes.keys())
+            if from_hashes[name] != to_hashes[name]
+        ],
+    }
+
+
+def find_metadata_validator(version: Version):
+    # The validator of every draft version is built from the current
+    # draft, so an outdated draft version must not get a 304
+    _validate_version(version)
+    return datastore.get_metadata_all_validator(version)
+
 
+def find_version_diff_validator(from_version: Version, to_version: Version):
+    _validate_version(from_version)
+    _validate_version(to_version)
+    return datastore.get_metadata_all_validator(from_version, to_version)
 
-def find_all_data_structures_ever():
-    all_datastore_versions = find_all_datastore_versions()
-    datastore_versions = [ver for ver in all_datastore_versions["versions"]]
-    data_structures = set()
-    for datastore_version in datastore_versions:
-        for ds_update in datastore_version["dataStructureUpdates"]:
-            data_structures.add(ds_update["name"])
-    return list(data_structures)
+
+def find_datastore_validator():
+    return datastore.get_datastore_validator()
+
+
+def find_all_data_structures_ever() -> list[str]:
+    return _data_structure_names.sorted_names(
+        datastore.get_datastore_versions(), datastore.get_draft_version()
+    )
+
+
+def load_version(version: Version) -> None:
+    """Loads metadata_all for the version and builds its indexes."""
+    _index_metadata_all(datastore.get_metadata_all(version))
+
+
+def _index_metadata_all(metadata_all: dict) -> None:
+    datastore.get_derived(
+        metadata_all, "data_structure_positions", _data_structure_positions
+    )
+    datastore.get_derived(
+        metadata_all,
+        "sorted_data_structure_names",
+        _sorted_data_structure_names,
+    )
+    _data_structure_hashes(metadata_all)
+    _search_index(metadata_all)
+    _skip_code_list_and_missing_values(metadata_all)
+
+
+def index_document(document: dict) -> None:
+    """
+    Builds the indexes for a datastore document, so that a reloaded file
+    is indexed before it replaces the previous one.
+    """
+    if "dataStructures" in document:
+        _index_metadata_all(document)
+    elif "versions" in document:
+        _released_statuses(document)
+        _released_status_histories(document)
+    else:
+        _draft_statuses(document)
+
+
+def watch_datastore() -> None:
+    """Reloads and indexes changed datastore files in the background."""
+    datastore.start_watcher(index_document)
+
+
+def preload_released_versions() -> int:
+    """
+    Loads and indexes the released versions that have a metadata_all
+    file, newest first, until the next version would not fit in the
+    cache, and returns how many are cached.
+    """
+    find_current_data_structure_status([])
+    find_all_data_structures_ever()
+    loaded: list[Version] = []
+    version_bytes = 0
+    for datastore_version in datastore.get_datastore_versions()["versions"]:
+        version = Version(datastore_version["version"])
+        headroom = datastore.get_cache_headroom()
+        if version_bytes > headroom:
+            logger.warning(
+                f"Stopped preloading before {version}: the metadata cache "
+                f"has {headroom} bytes left and the last version took "
+                f"{version_bytes} bytes"
+            )
+            break
+        try:
+            load_version(version)
+        except DataNotFoundException:
+            continue
+        version_bytes = headroom - datastore.get_cache_headroom()
+        loaded.append(version)
+        evicted = [
+            str(loaded_version)
+            for loaded_version in loaded
+            if not datastore.is_metadata_all_cached(loaded_version)
+        ]
+        if evicted:
+            logger.warning(
+                f"Stopped preloading at {version}: the metadata cache is "
+                f"full and evicted {', '.join(evicted)}"
+            )
+            break
+    return sum(datastore.is_metadata_all_cached(version) for version in loaded)
 
 
 def find_languages():
@@ -93,46 +475,279 @@ def find_languages():
 
 def find_all_metadata_skip_code_list_and_missing_values(version: Version):
     _validate_version(version)
-    metadata_all = datastore.get_metadata_all(version)
-    if "dataStructures" in metadata_all:
-        _clear_code_list_and_missing_values(metadata_all["dataStructures"])
-    else:
+    return _skip_code_list_and_missing_values(
+        datastore.get_metadata_all(version)
+    )
+
+
+def _skip_code_list_and_missing_values(metadata_all: dict) -> dict:
+    if "dataStructures" not in metadata_all:
         raise InvalidStorageFormatException("Invalid metadata format")
-    return metadata_all
+    return datastore.get_derived(
+        metadata_all,
+        "skip_code_list_and_missing_values",
+        _without_code_list_and_missing_values,
+    )
 
 
-def _clear_code_list_and_missing_values(data_structures: list[dict]):
-    represented_variables = []
-    for metadata in data_structures:
-        represented_measure = metadata["measureVariable"][
-            "representedVariables"
-        ]
-        represented_identifiers = list(
-            chain(
-                *[
-                    identifier["representedVariables"]
-                    for identifier in metadata["identifierVariables"]
-                ]
-            )
-        )
-        represented_attributes = list(
-            chain(
-                *[
-                    attribute["representedVariables"]
-                    for attribute in metadata["attributeVariables"]
-                ]
+def _without_code_list_and_missing_values(metadata_all: dict) -> dict:
+    """
+    Copies only the path down to each value domain, the rest of the
+    document is shared with metadata_all.
+    """
+    return {
+        **metadata_all,
+        "dataStructures": [
+            _data_structure_without_code_list(data_structure)
+            for data_structure in metadata_all["dataStructures"]
+        ],
+    }
+
+
+def _data_structure_without_code_list(data_structure: dict) -> dict:
+    return {
+        **data_structure,
+        "measureVariable": _variable_without_code_list(
+            data_structure["measureVariable"]
+        ),
+        "identifierVariables": [
+            _variable_without_code_list(identifier)
+            for identifier in data_structure["identifierVariables"]
+        ],
+        "attributeVariables": [
+            _variable_without_code_list(attribute)
+            for attribute in data_structure["attributeVariables"]
+        ],
+    }
+
+
+def _variable_without_code_list(variable: dict) -> dict:
+    return {
+        **variable,
+        "representedVariables": [
+            {
+                **represented_variable,
+                "valueDomain": {
+                    **represented_variable["valueDomain"],
+                    **{
+                        key: []
+                        for key in ("codeList", "missingValues")
+                        if key in represented_variable["valueDomain"]
+                    },
+                },
+            }
+            for represented_variable in variable["representedVariables"]
+        ],
+    }
+
+
+def _draft_statuses(draft_version: dict) -> dict[str, dict]:
+    if not draft_version:
+        return {}
+    return datastore.get_derived(
+        draft_version,
+        "latest_statuses",
+        lambda draft: _latest_statuses([draft]),
+    )
+
+
+def _released_statuses(datastore_versions: dict) -> dict[str, dict]:
+    return datastore.get_derived(
+        datastore_versions,
+        "latest_statuses",
+        lambda document: _latest_statuses(document["versions"]),
+    )
+
+
+def _released_status_histories(
+    datastore_versions: dict,
+) -> dict[str, tuple[list[int], list[dict]]]:
+    return datastore.get_derived(
+        datastore_versions,
+        "status_histories",
+        lambda document: _status_histories(document["versions"]),
+    )
+
+
+class _DataStructureNames:
+    """
+    Sorted names of all data structures ever released or drafted. Only
+    versions that were not seen before are read when the datastore
+    versions change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datastore_versions = None
+        self._draft_version = None
+        self._released_versions = set()
+        self._released_names = set()
+        self._sorted_released_names = []
+        self._sorted_names = []
+
+    def sorted_names(
+        self, datastore_versions: dict, draft_version: dict
+    ) -> list[str]:
+        with self._lock:
+            if datastore_versions is not self._datastore_versions:
+                self._update_released(datastore_versions)
+            if (
+                draft_version is not self._draft_version
+                or datastore_versions is not self._datastore_versions
+            ):
+                self._sorted_names = self._sorted_released_names
+                draft_names = {
+                    update["name"]
+                    for update in draft_version.get("dataStructureUpdates", [])
+                    if update["name"] not in self._released_names
+                }
+                if draft_names:
+                    self._sorted_names = list(self._sorted_names)
+                    for name in draft_names:
+                        insort(self._sorted_names, name)
+                self._draft_version = draft_version
+                self._datastore_versions = datastore_versions
+            return self._sorted_names
+
+    def _update_released(self, datastore_versions: dict) -> None:
+        versions = {
+            version["version"] for version in datastore_versions["versions"]
+        }
+        if not self._released_versions <= versions:
+            self._released_versions = set()
+            self._released_names = set()
+            self._sorted_released_names = []
+        sorted_released_names = list(self._sorted_released_names)
+        for version in datastore_versions["versions"]:
+            if version["version"] in self._released_versions:
+                continue
+            self._released_versions.add(version["version"])
+            for update in version["dataStructureUpdates"]:
+                if update["name"] not in self._released_names:
+                    self._released_names.add(update["name"])
+                    insort(sorted_released_names, update["name"])
+        self._sorted_released_names = sorted_released_names
+
+
+_data_structure_names = _DataStructureNames()
+
+
+def _latest_statuses(versions: list[dict]) -> dict[str, dict]:
+    """Versions are ordered newest first, so the first update wins."""
+    statuses = {}
+    for version in versions:
+        for data_structure in version["dataStructureUpdates"]:
+            if data_structure["name"] not in statuses:
+                statuses[data_structure["name"]] = {
+                    "operation": data_structure["operation"],
+                    "releaseTime": version["releaseTime"],
+                    "releaseStatus": data_structure["releaseStatus"],
+                }
+    return statuses
+
+
+def _status_histories(
+    versions: list[dict],
+) -> dict[str, tuple[list[int], list[dict]]]:
+    """
+    Returns release times in ascending order with the matching statuses,
+    for each data structure name. Versions are ordered newest first.
+    """
+    updates = {}
+    for version in reversed(versions):
+        for data_structure in reversed(version["dataStructureUpdates"]):
+            updates.setdefault(data_structure["name"], []).append(
+                (
+                    version["releaseTime"],
+                    {
+                        "operation": data_structure["operation"],
+                        "releaseTime": version["releaseTime"],
+                        "releaseStatus": data_structure["releaseStatus"],
+                    },
+                )
             )
+    histories = {}
+    for name, name_updates in updates.items():
+        name_updates.sort(key=lambda update: update[0])
+        histories[name] = (
+            [release_time for release_time, _ in name_updates],
+            [status for _, status in name_updates],
         )
-        represented_variables += (
-            represented_measure
-            + represented_identifiers
-            + represented_attributes
+    return histories
+
+
+def _data_structure_positions(metadata_all: dict) -> dict[str, int]:
+    return {
+        data_structure["name"]: position
+        for position, data_structure in enumerate(
+            metadata_all["dataStructures"]
         )
-    for represented_variable in represented_variables:
-        if "codeList" in represented_variable["valueDomain"]:
-            represented_variable["valueDomain"]["codeList"].clear()
-        if "missingValues" in represented_variable["valueDomain"]:
-            represented_variable["valueDomain"]["missingValues"].clear()
+    }
+
+
+def _sorted_data_structure_names(metadata_all: dict) -> list[str]:
+    return sorted(
+        data_structure["name"]
+        for data_structure in metadata_all["dataStructures"]
+    )
+
+
+def _data_structure_hashes(metadata_all: dict) -> dict[str, str]:
+    return datastore.get_derived(
+        metadata_all,
+        "data_structure_hashes",
+        lambda document: {
+            data_structure["name"]: content_hash(data_structure)
+            for data_structure in document["dataStructures"]
+        },
+    )
+
+
+def _search_index(metadata_all: dict) -> SearchIndex:
+    return datastore.get_derived(
+        metadata_all,
+        "search_index",
+        lambda document: build_index(document["dataStructures"]),
+    )
+
+
+def _code_list_index(
+    metadata_all: dict, data_structure: dict, variable_name: str
+) -> Optional[code_list.CodeListIndex]:
+    """
+    Code list indexes are built on first use, since most code lists are
+    never looked up on their own.
+    """
+    variable = next(
+        (
+            variable
+            for variable in [
+                data_structure["measureVariable"],
+                *data_structure.get("identifierVariables", []),
+                *data_structure.get("attributeVariables", []),
+            ]
+            if variable["name"] == variable_name
+        ),
+        None,
+    )
+    if variable is None:
+        return None
+    return datastore.get_derived(
+        metadata_all,
+        ("code_list_index", data_structure["name"], variable_name),
+        lambda _: code_list.build_index(variable),
+    )
+
+
+def _page(
+    sorted_names: list[str], limit: Optional[int], after: Optional[str]
+) -> tuple[list[str], Optional[str]]:
+    start = 0 if after is None else bisect_right(sorted_names, after)
+    end = len(sorted_names) if limit is None else start + limit
+    page = sorted_names[start:end]
+    if page and end < len(sorted_names):
+        return page, page[-1]
+    return page, None
 
 
 def _validate_version(version: Version):
@@ -0,0 +1,36 @@
+from typing import Any, Optional
+
+# A field tree maps each selected key to the tree of its selected
+# subkeys, or to None when the whole value is selected
+FieldTree = dict[str, Optional["FieldTree"]]
+
+
+def field_tree(fields: list[str]) -> FieldTree:
+    """Turns dotted paths such as measureVariable.dataType into a tree."""
+    tree: FieldTree = {}
+    for field in sorted(fields, key=lambda field: field.count(".")):
+        node = tree
+        *parents, last = field.split(".")
+        for key in parents:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[last] = None
+    return tree
+
+
+def project(value: Any, tree: FieldTree) -> Any:
+    """
+    Returns only the selected keys of value. Lists are projected item by
+    item and keys that are missing are left out.
+    """
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: value[key] if subtree is None else project(value[key], subtree)
+        for key, subtree in tree.items()
+        if key in value
+    }
@@ -0,0 +1,151 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+
+WORD_REG_EXP = re.compile(r"[^\W_]+")
+
+# Norwegian inflection suffixes, longest first, e.g. inntekter,
+# inntektene and inntektens all become inntekt
+SUFFIXES = (
+    "hetenes",
+    "hetene",
+    "hetens",
+    "heten",
+    "heter",
+    "endes",
+    "ande",
+    "ende",
+    "edes",
+    "enes",
+    "erte",
+    "ede",
+    "ane",
+    "ene",
+    "ens",
+    "ers",
+    "ets",
+    "het",
+    "ast",
+    "ert",
+    "en",
+    "ar",
+    "er",
+    "as",
+    "es",
+    "et",
+    "a",
+    "e",
+)
+MIN_STEM_LENGTH = 3
+
+# How much a match in each part of a data structure counts
+NAME_WEIGHT = 5.0
+LABEL_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+CATEGORY_WEIGHT = 1.0
+# Query terms also match longer index terms that start with them, such
+# as the parts of compound words, but count less than an exact match
+PREFIX_WEIGHT = 0.5
+
+
+@dataclass
+class SearchIndex:
+    """Maps each term to the weight it has in each data structure."""
+
+    postings: dict[str, dict[int, float]]
+    sorted_terms: list[str]
+    size: int
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase words, keeping æ, ø and å, and removes
+    Norwegian inflection suffixes. Words joined by underscores, as in
+    names, are split as well.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return [_stem(word) for word in WORD_REG_EXP.findall(text)]
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if (
+            word.endswith(suffix)
+            and len(word) - len(suffix) >= MIN_STEM_LENGTH
+        ):
+            return word[: -len(suffix)]
+    return word
+
+
+def build_index(data_structures: list[dict]) -> SearchIndex:
+    postings: dict[str, dict[int, float]] = {}
+    # Code list categories repeat across data structures, so each
+    # distinct text is tokenized once
+    terms_by_text: dict[str, list[str]] = {}
+    for position, data_structure in enumerate(data_structures):
+        for text, weight in _searchable_texts(data_structure):
+            terms = terms_by_text.get(text)
+            if terms is None:
+                terms = terms_by_text[text] = tokenize(text)
+            for term in terms:
+                weights = postings.setdefault(term, {})
+                weights[position] = weights.get(position, 0.0) + weight
+    return SearchIndex(postings, sorted(postings), len(data_structures))
+
+
+def _searchable_texts(data_structure: dict):
+    yield data_structure["name"], NAME_WEIGHT
+    yield data_structure.get("description", ""), DESCRIPTION_WEIGHT
+    yield data_structure.get("populationDescription", ""), DESCRIPTION_WEIGHT
+    measure = data_structure.get("measureVariable", {})
+    yield measure.get("label", ""), LABEL_WEIGHT
+    for represented in measure.get("representedVariables", []):
+        yield represented.get("description", ""), DESCRIPTION_WEIGHT
+        value_domain = represented.get("valueDomain", {})
+        for code_item in value_domain.get("codeList") or []:
+            yield code_item.get("category", ""), CATEGORY_WEIGHT
+
+
+def search(index: SearchIndex, query: str, limit: int) -> list[tuple]:
+    """
+    Returns up to limit (position, score) pairs of the data structures
+    that match every term of the query, best match first. Scores add up
+    the weight of each term times its inverse document frequency.
+    """
+    scores: dict[int, float] = {}
+    for number, term in enumerate(dict.fromkeys(tokenize(query))):
+        term_scores = _term_scores(index, term)
+        if number == 0:
+            scores = term_scores
+        else:
+            scores = {
+                position: score + term_scores[position]
+                for position, score in scores.items()
+                if position in term_scores
+            }
+        if not scores:
+            return []
+    return heapq.nlargest(
+        limit, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def _term_scores(index: SearchIndex, term: str) -> dict[int, float]:
+    scores: dict[int, float] = {}
+    terms = index.sorted_terms
+    for indexed_term in islice(terms, bisect_left(terms, term), None):
+        if not indexed_term.startswith(term):
+            break
+        weights = index.postings[indexed_term]
+        factor = math.log(1 + index.size / len(weights))
+        if indexed_term != term:
+            factor *= PREFIX_WEIGHT
+        for match, weight in weights.items():
+            scores[match] = max(scores.get(match, 0.0), weight * factor)
+    return scores
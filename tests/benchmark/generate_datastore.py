@@ -0,0 +1,271 @@
+"""
+Generates a synthetic datastore with the same file layout as a real one:
+
+    python -m tests.benchmark.generate_datastore /tmp/datastore \\
+        --data-structures 2000 --versions 200 --code-list-size 10000
+"""
+
+import argparse
+import json
+import os
+import random
+
+_KEY_TYPES = [
+    ("PERSON", "Person", "Statistisk enhet er person."),
+    ("FAMILIE", "Familie", "Statistisk enhet er familie."),
+    ("VIRKSOMHET", "Virksomhet", "Statistisk enhet er virksomhet."),
+]
+_WORDS = [
+    "inntekt",
+    "utdanning",
+    "bosted",
+    "arbeid",
+    "skatt",
+    "trygd",
+    "helse",
+    "næring",
+    "kommune",
+    "fylke",
+    "sivilstand",
+    "barn",
+    "alder",
+    "kjønn",
+    "yrke",
+    "formue",
+]
+_START = 16801
+_STOP = 18261
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+
+def _represented_variable(value_domain: dict, description: str) -> dict:
+    return {
+        "validPeriod": {"start": _START, "stop": _STOP},
+        "description": description,
+        "valueDomain": value_domain,
+    }
+
+
+def _code_list(rng: random.Random, size: int) -> list[dict]:
+    return [
+        {"code": str(code), "category": f"{_text(rng, 2)} {code}"}
+        for code in range(size)
+    ]
+
+
+def _data_structure(
+    rng: random.Random, name: str, code_list_size: int, coded: bool
+) -> dict:
+    key_name, key_label, key_description = rng.choice(_KEY_TYPES)
+    if coded:
+        value_domain = {
+            "codeList": _code_list(rng, code_list_size),
+            "missingValues": ["0"],
+        }
+        data_type = "String"
+    else:
+        value_domain = {
+            "description": _text(rng, 6),
+            "unitOfMeasure": "NOK",
+        }
+        data_type = "Long"
+    instant = {
+        "description": "N/A",
+        "unitOfMeasure": "N/A",
+    }
+    return {
+        "name": name,
+        "populationDescription": _text(rng, 8),
+        "temporality": rng.choice(["FIXED", "STATUS", "ACCUMULATED", "EVENT"]),
+        "temporalCoverage": {"start": _START, "stop": _STOP},
+        "subjectFields": [_text(rng, 1) for _ in range(rng.randint(1, 3))],
+        "languageCode": "no",
+        "measureVariable": {
+            "name": name,
+            "label": _text(rng, 3),
+            "dataType": data_type,
+            "representedVariables": [
+                _represented_variable(value_domain, _text(rng, 12))
+            ],
+            "variableRole": "Measure",
+        },
+        "identifierVariables": [
+            {
+                "name": f"{key_name}_ID_1",
+                "label": f"{key_label}identifikator",
+                "dataType": "Long",
+                "representedVariables": [
+                    _represented_variable(instant, f"Identifikator {key_name}")
+                ],
+                "keyType": {
+                    "name": key_name,
+                    "label": key_label,
+                    "description": key_description,
+                },
+                "format": "RandomUInt48",
+                "variableRole": "Identifier",
+            }
+        ],
+        "attributeVariables": [
+            {
+                "name": role.upper(),
+                "label": f"{role}dato",
+                "representedVariables": [
+                    _represented_variable(instant, f"{role}dato")
+                ],
+                "dataType": "Instant",
+                "variableRole": role,
+            }
+            for role in ("Start", "Stop")
+        ],
+    }
+
+
+def _update(name: str, operation: str, release_status: str) -> dict:
+    return {
+        "description": "Syntetisk endring",
+        "name": name,
+        "operation": operation,
+        "releaseStatus": release_status,
+    }
+
+
+def _write_json(path: str, content) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False)
+
+
+def generate_datastore(
+    datastore_root_dir: str,
+    data_structures: int = 1000,
+    versions: int = 100,
+    code_list_size: int = 1000,
+    coded_share: float = 0.2,
+    metadata_versions: int = 3,
+    seed: int = 0,
+) -> dict:
+    """
+    Writes a datastore where the data structures are added evenly over
+    the released versions, followed by a draft that adds one more. Only
+    the newest metadata_versions released versions get a metadata_all
+    file. Returns the scale of the generated datastore.
+    """
+    rng = random.Random(seed)
+    directory = f"{datastore_root_dir}/datastore"
+    os.makedirs(directory, exist_ok=True)
+
+    names = [
+        f"SYNTETISK_{position:06d}" for position in range(data_structures)
+    ]
+    generated = {
+        name: _data_structure(
+            rng, name, code_list_size, rng.random() < coded_share
+        )
+        for name in names
+    }
+    data_store = {
+        "name": "no.ssb.syntetisk",
+        "label": "Syntetiske data",
+        "description": "Generert datastore for ytelsestester",
+        "languageCode": "no",
+    }
+
+    released = []
+    version_list = []
+    per_version = max(1, -(-data_structures // versions))
+    for number in range(1, versions + 1):
+        added = names[(number - 1) * per_version : number * per_version]
+        released.extend(added)
+        version = {
+            "version": f"{number}.0.0.0",
+            "description": f"Syntetisk versjon {number}",
+            "releaseTime": 1600000000 + number * 86400,
+            "languageCode": "no",
+            "dataStructureUpdates": [
+                _update(name, "ADD", "RELEASED") for name in added
+            ],
+            "updateType": "MAJOR",
+        }
+        version_list.insert(0, version)
+        if number > versions - metadata_versions:
+            _write_json(
+                f"{directory}/metadata_all__{number}_0_0.json",
+                {
+                    "dataStore": data_store,
+                    "dataStructures": [generated[name] for name in released],
+                },
+            )
+    _write_json(
+        f"{directory}/datastore_versions.json",
+        {
+            "name": data_store["name"],
+            "label": data_store["label"],
+            "description": data_store["description"],
+            "versions": version_list,
+        },
+    )
+
+    draft_name = f"SYNTETISK_{data_structures:06d}"
+    draft_release_time = 1600000000 + (versions + 1) * 86400
+    _write_json(
+        f"{directory}/draft_version.json",
+        {
+            "version": f"0.0.0.{draft_release_time}",
+            "description": "Utkast",
+            "releaseTime": draft_release_time,
+            "languageCode": "no",
+            "dataStructureUpdates": [_update(draft_name, "ADD", "DRAFT")],
+            "updateType": "MINOR",
+        },
+    )
+    _write_json(
+        f"{directory}/metadata_all__DRAFT.json",
+        {
+            "dataStore": data_store,
+            "dataStructures": [
+                *(generated[name] for name in released),
+                _data_structure(rng, draft_name, code_list_size, True),
+            ],
+        },
+    )
+    return {
+        "dataStructures": data_structures,
+        "versions": versions,
+        "codeListSize": code_list_size,
+        "codedShare": coded_share,
+        "metadataVersions": min(metadata_versions, versions),
+        "seed": seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("datastore_root_dir")
+    parser.add_argument("--data-structures", type=int, default=1000)
+    parser.add_argument("--versions", type=int, default=100)
+    parser.add_argument("--code-list-size", type=int, default=1000)
+    parser.add_argument("--coded-share", type=float, default=0.2)
+    parser.add_argument(
+        "--metadata-versions",
+        type=int,
+        default=3,
+        help="number of newest versions that get a metadata_all file",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_datastore(
+        args.datastore_root_dir,
+        args.data_structures,
+        args.versions,
+        args.code_list_size,
+        args.coded_share,
+        args.metadata_versions,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Measures latency, throughput and peak memory for every route in
+metadata_api, against a synthetic datastore, and writes a json report:
+
+    python -m tests.benchmark.run_benchmarks --output report.json
+    python -m tests.benchmark.run_benchmarks --compare report.json
+
+Each case is requested with empty caches (cold), once with Python
+allocations traced for the peak memory and once timed, and then
+repeatedly with warm caches.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from metadata_service.api.pagination import encode_cursor
+from tests.benchmark.generate_datastore import generate_datastore
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+
+
+def _metadata_all_path(directory: str, version: str) -> str:
+    return f"{directory}/metadata_all__{'_'.join(version.split('.')[:3])}.json"
+
+
+def _cases(datastore_root_dir: str) -> list[dict]:
+    directory = f"{datastore_root_dir}/datastore"
+    with open(f"{directory}/datastore_versions.json", encoding="utf-8") as f:
+        datastore_versions = json.load(f)
+    with open(f"{directory}/draft_version.json", encoding="utf-8") as f:
+        draft_version = json.load(f)
+    # Only some of the versions have a metadata_all file
+    versions = [
+        version["version"]
+        for version in datastore_versions["versions"]
+        if os.path.exists(_metadata_all_path(directory, version["version"]))
+    ]
+    latest = versions[0]
+    with open(_metadata_all_path(directory, latest), encoding="utf-8") as f:
+        latest_data_structures = json.load(f)["dataStructures"]
+    coded = next(
+        data_structure
+        for data_structure in latest_data_structures
+        if data_structure["measureVariable"]["representedVariables"][0][
+            "valueDomain"
+        ].get("codeList")
+    )
+    code_list = coded["measureVariable"]["representedVariables"][0][
+        "valueDomain"
+    ]["codeList"]
+    category_word = code_list[0]["category"].split()[0]
+    names = sorted(
+        {
+            update["name"]
+            for version in datastore_versions["versions"]
+            for update in version["dataStructureUpdates"]
+        }
+    )
+    some_names = ",".join(names[:: max(1, len(names) // 10)][:10])
+
+    cases = [
+        ("GET", "/metadata/data-store", {}, None, False),
+        (
+            "GET",
+            "/metadata/data-structures/status",
+            {"names": some_names},
+            None,
+            False,
+        ),
+        (
+            "POST",
+            "/metadata/data-structures/status",
+            {},
+            {"names": some_names},
+            False,
+        ),
+        ("GET", "/metadata/all-data-structures", {}, None, False),
+        (
+            "GET",
+            "/metadata/all-data-structures",
+            {"limit": "100", "cursor": encode_cursor(names[len(names) // 2])},
+            None,
+            False,
+        ),
+        ("GET", "/languages", {}, None, False),
+        (
+            "POST",
+            "/metadata/data-structures/batch",
+            {},
+            {
+                "requests": [
+                    {"version": version, "names": some_names.split(",")}
+                    for version in versions[:10]
+                ]
+            },
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/diff",
+            {
+                "from_version": versions[min(1, len(versions) - 1)],
+                "to_version": latest,
+            },
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/search",
+            {"version": latest, "q": category_word},
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures/code-list",
+            {"version": latest, "name": coded["name"], "limit": "100"},
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures/code-list",
+            {
+                "version": latest,
+                "name": coded["name"],
+                "code": code_list[len(code_list) // 2]["code"],
+            },
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures/code-list",
+            {
+                "version": latest,
+                "name": coded["name"],
+                "prefix": category_word,
+            },
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures",
+            {"version": latest, "limit": "100"},
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures",
+            {
+                "version": latest,
+                "limit": "100",
+                "cursor": encode_cursor(names[len(names) // 2]),
+            },
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/data-structures",
+            {"version": latest, "names": some_names, "fields": "name,label"},
+            None,
+            False,
+        ),
+        (
+            "GET",
+            "/metadata/all",
+            {"version": latest, "fields": "name,measureVariable.label"},
+            None,
+            False,
+        ),
+    ]
+    for version in (latest, draft_version["version"]):
+        for skip_code_lists in (False, True):
+            query = {"version": version}
+            if skip_code_lists:
+                query["skip_code_lists"] = "true"
+            cases.append(
+                (
+                    "GET",
+                    "/metadata/data-structures",
+                    {**query, "names": some_names},
+                    None,
+                    skip_code_lists,
+                )
+            )
+            cases.append(
+                ("GET", "/metadata/all", query, None, skip_code_lists)
+            )
+    return [
+        {
+            "method": method,
+            "route": route,
+            "query": query,
+            "body": body,
+            "skipCodeLists": skip_code_lists,
+            "format": media_type,
+        }
+        for method, route, query, body, skip_code_lists in cases
+        for media_type in (JSON, MSGPACK)
+    ]
+
+
+def _clear_caches() -> None:
+    from metadata_service.adapter import datastore
+    from metadata_service.api.response_cache import response_cache
+
+    datastore.file_cache.clear()
+    response_cache.clear()
+
+
+def _request(client, case: dict):
+    return client.open(
+        case["route"],
+        method=case["method"],
+        query_string=case["query"],
+        json=case["body"],
+        headers={"Accept": case["format"]},
+    )
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    position = min(
+        len(sorted_values) - 1, int(len(sorted_values) * percentile / 100)
+    )
+    return sorted_values[position]
+
+
+def _measure(client, case: dict, iterations: int) -> list[dict]:
+    _clear_caches()
+    tracemalloc.start()
+    _request(client, case)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    _clear_caches()
+    started = time.perf_counter()
+    response = _request(client, case)
+    cold_seconds = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"{case['method']} {case['route']} returned "
+            f"{response.status_code}: {response.get_data()[:200]!r}"
+        )
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _request(client, case)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    common = {
+        "method": case["method"],
+        "route": case["route"],
+        "format": case["format"],
+        "skipCodeLists": case["skipCodeLists"],
+        "query": case["query"],
+        "responseBytes": len(response.get_data()),
+    }
+    return [
+        {
+            **common,
+            "cache": "cold",
+            "iterations": 1,
+            "latencyMs": {"mean": cold_seconds * 1000},
+            "peakMemoryBytes": peak_bytes,
+        },
+        {
+            **common,
+            "cache": "warm",
+            "iterations": iterations,
+            "latencyMs": {
+                "mean": statistics.fmean(latencies) * 1000,
+                "p50": _percentile(latencies, 50) * 1000,
+                "p95": _percentile(latencies, 95) * 1000,
+                "p99": _percentile(latencies, 99) * 1000,
+                "max": latencies[-1] * 1000,
+            },
+            "throughputPerSecond": iterations / sum(latencies),
+        },
+    ]
+
+
+def run_benchmarks(
+    datastore_root_dir: str, scale: dict, iterations: int
+) -> dict:
+    os.environ["DATASTORE_ROOT_DIR"] = datastore_root_dir
+    os.environ.setdefault("DOCKER_HOST_NAME", "localhost")
+    os.environ.setdefault("COMMIT_ID", "benchmark")
+    from metadata_service.app import app
+
+    client = app.test_client()
+    results = []
+    for case in _cases(datastore_root_dir):
+        results.extend(_measure(client, case, iterations))
+    return {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commitId": os.environ["COMMIT_ID"],
+        "scale": scale,
+        "maxRssBytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * 1024,
+        "results": results,
+    }
+
+
+def _result_key(result: dict) -> tuple:
+    return (
+        result["method"],
+        result["route"],
+        result["format"],
+        result["skipCodeLists"],
+        json.dumps(result["query"], sort_keys=True),
+        result["cache"],
+    )
+
+
+def compare_reports(previous: dict, current: dict) -> list[str]:
+    """Lists the change in mean latency for each case in both reports."""
+    previous_results = {
+        _result_key(result): result for result in previous["results"]
+    }
+    lines = []
+    for result in current["results"]:
+        before = previous_results.get(_result_key(result))
+        if before is None:
+            continue
+        change = (
+            result["latencyMs"]["mean"] / before["latencyMs"]["mean"] - 1
+        ) * 100
+        lines.append(
+            f"{result['method']} {result['route']} {result['format']} "
+            f"skipCodeLists={result['skipCodeLists']} {result['cache']}: "
+            f"{before['latencyMs']['mean']:.2f} ms -> "
+            f"{result['latencyMs']['mean']:.2f} ms ({change:+.1f}%)"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--datastore",
+        help="existing DATASTORE_ROOT_DIR, a synthetic one is generated "
+        "if not given",
+    )
+    parser.add_argument("--data-structures", type=int, default=1000)
+    parser.add_argument("--versions", type=int, default=100)
+    parser.add_argument("--code-list-size", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--compare", help="previous report to compare with")
+    parser.add_argument(
+        "--log", action="store_true", help="keep request logging enabled"
+    )
+    args = parser.parse_args()
+    if not args.log:
+        logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        if args.datastore:
+            datastore_root_dir = args.datastore
+            scale = {"datastore": args.datastore}
+        else:
+            datastore_root_dir = temporary_dir
+            scale = generate_datastore(
+                temporary_dir,
+                args.data_structures,
+                args.versions,
+                args.code_list_size,
+            )
+        report = run_benchmarks(datastore_root_dir, scale, args.iterations)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        for line in compare_reports(previous, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
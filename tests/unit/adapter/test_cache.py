@@ -0,0 +1,172 @@
+import json
+import os
+
+from metadata_service.adapter.cache import (
+    FileCache,
+    PARSED_JSON_SIZE_FACTOR,
+    LRUCache,
+    estimate_size,
+    load_json,
+)
+
+
+def _write_json(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+
+
+def test_get_returns_cached_value(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"version": "1.0.0.0"})
+    cache = FileCache(1024 * 1024)
+
+    first = cache.get(json_file, load_json)
+    second = cache.get(json_file, load_json)
+
+    assert first == {"version": "1.0.0.0"}
+    assert first is second
+    assert cache.misses == 1
+    assert cache.hits == 1
+
+
+def test_get_reloads_changed_file(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"version": "1.0.0.0"})
+    cache = FileCache(1024 * 1024)
+    cache.get(json_file, load_json)
+
+    _write_json(json_file, {"version": "2.0.0.0"})
+    stat = os.stat(json_file)
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert cache.get(json_file, load_json) == {"version": "2.0.0.0"}
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    files = [str(tmp_path / f"file_{i}.json") for i in range(3)]
+    for json_file in files:
+        _write_json(json_file, {"name": "x" * 1000})
+    cache = FileCache(1024 * 1024)
+    cache.get(files[0], load_json)
+    cache.max_bytes = cache.current_bytes * 2
+
+    cache.get(files[1], load_json)
+    cache.get(files[0], load_json)
+    cache.get(files[2], load_json)
+
+    assert cache.evictions == 1
+    cache.get(files[0], load_json)
+    cache.get(files[1], load_json)
+    assert cache.misses == 4
+
+
+def test_peek_does_not_count_or_reorder():
+    cache = LRUCache(1024)
+    cache.store("a", 1, "a", 10)
+    cache.store("b", 1, "b", 10)
+
+    assert cache.peek("a", 1).value == "a"
+    assert cache.peek("a", 2) is None
+    assert cache.peek("c", 1) is None
+    assert cache.hits == 0 and cache.misses == 0
+    assert [key for key, _ in cache.items()] == ["a", "b"]
+
+
+def test_entry_size_is_estimated_from_file_size(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"name": "x" * 1000})
+    cache = FileCache(1024 * 1024)
+    cache.get(json_file, load_json)
+    assert cache.current_bytes == (
+        os.path.getsize(json_file) * PARSED_JSON_SIZE_FACTOR
+    )
+
+
+def test_entry_larger_than_budget_is_not_cached(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"name": "x" * 1000})
+    cache = FileCache(100)
+
+    assert cache.get(json_file, load_json) == {"name": "x" * 1000}
+    assert cache.current_bytes == 0
+    cache.get(json_file, load_json)
+    assert cache.misses == 2
+
+
+def test_get_derived_is_built_once_per_cached_value(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"version": "1.0.0.0"})
+    cache = FileCache(1024 * 1024)
+    builds = []
+
+    def build(value):
+        builds.append(value)
+        return value["version"]
+
+    value = cache.get(json_file, load_json)
+    assert cache.get_derived(value, "version", build) == "1.0.0.0"
+    assert cache.get_derived(value, "version", build) == "1.0.0.0"
+    assert len(builds) == 1
+
+    _write_json(json_file, {"version": "2.0.0.0"})
+    stat = os.stat(json_file)
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    value = cache.get(json_file, load_json)
+    assert cache.get_derived(value, "version", build) == "2.0.0.0"
+    assert len(builds) == 2
+
+
+def test_get_derived_counts_toward_budget(tmp_path):
+    files = [str(tmp_path / f"file_{i}.json") for i in range(2)]
+    for json_file in files:
+        _write_json(json_file, {"name": "x" * 1000})
+    cache = FileCache(1024 * 1024)
+    first = cache.get(files[0], load_json)
+    size = cache.current_bytes
+    cache.get(files[1], load_json)
+    cache.get(files[0], load_json)
+
+    cache.get_derived(first, "copy", lambda value: dict(value))
+    assert cache.current_bytes > size * 2
+    derived = [f"{i:0100}" for i in range(100)]
+    cache.max_bytes = cache.current_bytes + estimate_size(derived) - 1
+    cache.get_derived(first, "big", lambda _: derived)
+    assert cache.evictions == 1
+    assert cache.contains(files[0])
+    assert not cache.contains(files[1])
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_estimate_size_counts_shared_objects_once():
+    item = {"name": "x" * 1000}
+    assert estimate_size([item, item]) < 2 * estimate_size(item)
+    assert estimate_size((item,)) > estimate_size(item)
+
+
+def test_get_derived_for_uncached_value(tmp_path):
+    cache = FileCache(1024 * 1024)
+    builds = []
+
+    def build(value):
+        builds.append(value)
+        return value["version"]
+
+    value = {"version": "1.0.0.0"}
+    assert cache.get_derived(value, "version", build) == "1.0.0.0"
+    assert cache.get_derived(value, "version", build) == "1.0.0.0"
+    assert len(builds) == 2
+
+
+def test_get_entry_has_content_digest(tmp_path):
+    json_file = str(tmp_path / "file.json")
+    _write_json(json_file, {"version": "1.0.0.0"})
+    cache = FileCache(1024 * 1024)
+
+    digest = cache.get_entry(json_file, load_json).digest
+    assert digest == cache.get_entry(json_file, load_json).digest
+
+    _write_json(json_file, {"version": "2.0.0.0"})
+    stat = os.stat(json_file)
+    os.utime(json_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert digest != cache.get_entry(json_file, load_json).digest
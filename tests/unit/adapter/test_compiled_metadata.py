@@ -0,0 +1,50 @@
+import json
+import os
+import shutil
+
+from metadata_service.adapter.compiled_metadata import (
+    CompiledMetadata,
+    compile_metadata_all,
+)
+from metadata_service.compile import compile_datastore
+
+METADATA_ALL_FILE_PATH = "tests/resources/fixtures/domain/metadata_all.json"
+
+
+def test_compiled_metadata_all(tmp_path):
+    compiled_file = str(tmp_path / "metadata_all__1_0_0.compiled")
+    compile_metadata_all(METADATA_ALL_FILE_PATH, compiled_file)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        metadata_all = json.load(f)
+
+    compiled = CompiledMetadata(compiled_file)
+
+    assert compiled.metadata_all() == metadata_all
+    assert list(compiled.metadata_all()) == list(metadata_all)
+    stat = os.stat(METADATA_ALL_FILE_PATH)
+    assert compiled.is_compiled_from(stat.st_size, stat.st_mtime_ns)
+    assert not compiled.is_compiled_from(stat.st_size + 1, stat.st_mtime_ns)
+
+
+def test_compiled_data_structures(tmp_path):
+    compiled_file = str(tmp_path / "metadata_all__1_0_0.compiled")
+    compile_metadata_all(METADATA_ALL_FILE_PATH, compiled_file)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        metadata_all = json.load(f)
+
+    actual = CompiledMetadata(compiled_file).data_structures(
+        ["TEST_PERSON_PETS", "NO_SUCH_DATASET", "TEST_PERSON_INCOME"]
+    )
+
+    assert actual == metadata_all["dataStructures"]
+
+
+def test_compile_datastore(tmp_path):
+    (tmp_path / "datastore").mkdir()
+    json_file = str(tmp_path / "datastore" / "metadata_all__1_0_0.json")
+    shutil.copy(METADATA_ALL_FILE_PATH, json_file)
+
+    assert compile_datastore(str(tmp_path)) == 1
+    assert os.path.exists(json_file.replace(".json", ".compiled"))
+    assert compile_datastore(str(tmp_path)) == 0
+    assert compile_datastore(str(tmp_path), force=True) == 1
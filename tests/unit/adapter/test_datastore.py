@@ -0,0 +1,107 @@
+import json
+import shutil
+
+import pytest
+
+from metadata_service.adapter import datastore
+from metadata_service.adapter.compiled_metadata import compile_metadata_all
+from metadata_service.domain.version import Version
+from metadata_service.exceptions.exceptions import DataNotFoundException
+
+METADATA_ALL_FILE_PATH = "tests/resources/fixtures/domain/metadata_all.json"
+
+
+@pytest.fixture
+def datastore_dir(tmp_path, monkeypatch):
+    (tmp_path / "datastore").mkdir()
+    monkeypatch.setattr(datastore, "DATASTORE_ROOT_DIR", str(tmp_path))
+    datastore.file_cache.clear()
+    yield tmp_path / "datastore"
+    datastore.file_cache.clear()
+
+
+def _write_json(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+
+
+def test_get_metadata_all_is_cached(datastore_dir):
+    _write_json(datastore_dir / "metadata_all__1_0_0.json", {"a": 1})
+    first = datastore.get_metadata_all(Version("1.0.0.0"))
+    second = datastore.get_metadata_all(Version("1.0.0.0"))
+    assert first == {"a": 1}
+    assert first is second
+
+
+def test_get_metadata_all_not_found(datastore_dir):
+    with pytest.raises(DataNotFoundException):
+        datastore.get_metadata_all(Version("1.0.0.0"))
+
+
+def test_get_metadata_all_validator(datastore_dir):
+    assert datastore.get_metadata_all_validator(Version("1.0.0.0")) is None
+    _write_json(datastore_dir / "metadata_all__1_0_0.json", {"a": 1})
+    validator = datastore.get_metadata_all_validator(Version("1.0.0.0"))
+    assert len(validator.signature) == 1
+    assert validator == datastore.get_metadata_all_validator(
+        Version("1.0.0.0")
+    )
+
+    _write_json(datastore_dir / "metadata_all__DRAFT.json", {"a": 1})
+    assert datastore.get_metadata_all_validator(Version("0.0.0.1")) is None
+    _write_json(datastore_dir / "draft_version.json", {"version": "0.0.0.1"})
+    draft_validator = datastore.get_metadata_all_validator(Version("0.0.0.1"))
+    assert len(draft_validator.signature) == 2
+    assert draft_validator.digest != validator.digest
+
+    assert (
+        datastore.get_metadata_all_validator(
+            Version("1.0.0.0"), Version("2.0.0.0")
+        )
+        is None
+    )
+    _write_json(datastore_dir / "metadata_all__2_0_0.json", {"a": 2})
+    diff_validator = datastore.get_metadata_all_validator(
+        Version("1.0.0.0"), Version("2.0.0.0")
+    )
+    assert len(diff_validator.signature) == 2
+    assert diff_validator.digest != validator.digest
+
+
+def test_get_compiled_data_structures(datastore_dir):
+    json_file = str(datastore_dir / "metadata_all__1_0_0.json")
+    shutil.copy(METADATA_ALL_FILE_PATH, json_file)
+    assert (
+        datastore.get_compiled_data_structures(
+            Version("1.0.0.0"), ["TEST_PERSON_PETS"]
+        )
+        is None
+    )
+    json_validator = datastore.get_metadata_all_validator(Version("1.0.0.0"))
+    compile_metadata_all(json_file, json_file.replace(".json", ".compiled"))
+    datastore.file_cache.clear()
+
+    actual = datastore.get_compiled_data_structures(
+        Version("1.0.0.0"), ["TEST_PERSON_PETS"]
+    )
+    assert [data_structure["name"] for data_structure in actual] == [
+        "TEST_PERSON_PETS"
+    ]
+    assert (
+        datastore.get_metadata_all_validator(Version("1.0.0.0"))
+        == json_validator
+    )
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        assert datastore.get_metadata_all(Version("1.0.0.0")) == json.load(f)
+
+
+def test_stale_compiled_file_is_ignored(datastore_dir):
+    json_file = str(datastore_dir / "metadata_all__1_0_0.json")
+    shutil.copy(METADATA_ALL_FILE_PATH, json_file)
+    compile_metadata_all(json_file, json_file.replace(".json", ".compiled"))
+    _write_json(json_file, {"dataStructures": []})
+
+    assert datastore.get_compiled_metadata(Version("1.0.0.0")) is None
+    assert datastore.get_metadata_all(Version("1.0.0.0")) == {
+        "dataStructures": []
+    }
@@ -0,0 +1,103 @@
+import json
+
+from metadata_service.adapter import metrics
+from metadata_service.config import environment
+
+
+def test_render_counters_and_histograms():
+    metrics.inc(
+        "http_requests_total",
+        {"method": "GET", "route": "/render-test", "status": 200},
+        2,
+    )
+    metrics.observe(
+        "http_request_duration_seconds",
+        {"method": "GET", "route": "/render-test"},
+        0.003,
+    )
+    metrics.observe(
+        "http_request_duration_seconds",
+        {"method": "GET", "route": "/render-test"},
+        20,
+    )
+    lines = metrics.render().splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert (
+        'http_requests_total{method="GET",route="/render-test",status="200"}'
+        " 2" in lines
+    )
+    labels = 'method="GET",route="/render-test"'
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="0.0025"}} 0'
+        in lines
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1'
+        in lines
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="10.0"}} 1'
+        in lines
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2'
+        in lines
+    )
+    assert f"http_request_duration_seconds_count{{{labels}}} 2" in lines
+
+
+def test_render_escapes_label_values():
+    metrics.inc(
+        "http_requests_total",
+        {"method": "GET", "route": 'quote"back\\slash', "status": 200},
+    )
+    assert 'route="quote\\"back\\\\slash"' in metrics.render()
+
+
+def test_render_adds_up_processes(mocker, tmp_path):
+    mocker.patch.dict(
+        environment._ENVIRONMENT_VARIABLES, {"METRICS_DIR": str(tmp_path)}
+    )
+    dead_pid = 2**22 + 1
+    with open(tmp_path / f"metrics_{dead_pid}.json", "w") as f:
+        json.dump(
+            {
+                "pid": dead_pid,
+                "counters": [
+                    [
+                        "http_requests_total",
+                        [["method", "GET"], ["route", "/sum"]],
+                        3,
+                    ]
+                ],
+                "histograms": [
+                    [
+                        "datastore_file_parse_seconds",
+                        [["format", "sum-test"]],
+                        list(metrics.DURATION_BUCKETS),
+                        [0, 0, 0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0],
+                        1.1,
+                        2,
+                    ]
+                ],
+                "gauges": [["loaded_versions", [], 7]],
+            },
+            f,
+        )
+    metrics.inc("http_requests_total", {"method": "GET", "route": "/sum"})
+    metrics.observe(
+        "datastore_file_parse_seconds", {"format": "sum-test"}, 0.5
+    )
+
+    lines = metrics.render().splitlines()
+    assert 'http_requests_total{method="GET",route="/sum"} 4' in lines
+    assert (
+        'datastore_file_parse_seconds_bucket{format="sum-test",le="1.0"} 3'
+        in lines
+    )
+    assert 'datastore_file_parse_seconds_count{format="sum-test"} 3' in lines
+    assert f'loaded_versions{{pid="{dead_pid}"}} 7' not in lines
+    assert any(line.startswith("loaded_versions{pid=") for line in lines)
+
+    metrics.clear_directory()
+    assert list(tmp_path.iterdir()) == []
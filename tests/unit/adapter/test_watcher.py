@@ -0,0 +1,113 @@
+import json
+import os
+import time
+
+import pytest
+
+from metadata_service.adapter.cache import FileCache, load_json
+from metadata_service.adapter.watcher import DatastoreWatcher
+
+
+def _write_json(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+
+
+def _touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def watched(tmp_path):
+    file_cache = FileCache(1024 * 1024)
+    indexed = []
+    watcher = DatastoreWatcher(
+        str(tmp_path), file_cache, indexed.append, interval=0.05
+    )
+    return tmp_path, file_cache, watcher, indexed
+
+
+def test_check_swaps_in_reloaded_and_indexed_files(watched):
+    directory, file_cache, watcher, indexed = watched
+    path = str(directory / "a.json")
+    _write_json(path, {"a": 1})
+    file_cache.validate_on_read = False
+    assert file_cache.get(path, load_json) == {"a": 1}
+    assert watcher.check() == []
+
+    _write_json(path, {"a": 2})
+    _touch_later(path)
+    assert file_cache.get(path, load_json) == {"a": 1}
+    assert watcher.check() == [path]
+    assert indexed == [{"a": 2}]
+    assert file_cache.get(path, load_json) is indexed[0]
+
+
+def test_check_builds_derived_values_before_swap(watched):
+    directory, file_cache, watcher, _ = watched
+    path = str(directory / "a.json")
+    _write_json(path, {"a": 1})
+    file_cache.get(path, load_json)
+    builds = []
+    watcher.on_reload = lambda document: file_cache.get_derived(
+        document, "index", lambda value: builds.append(value) or len(builds)
+    )
+
+    _write_json(path, {"a": 2})
+    _touch_later(path)
+    watcher.check()
+    document = file_cache.get(path, load_json)
+    assert file_cache.get_derived(document, "index", lambda _: 0) == 1
+    assert builds == [{"a": 2}]
+
+
+def test_check_keeps_previous_file_when_load_fails(watched):
+    directory, file_cache, watcher, indexed = watched
+    path = str(directory / "a.json")
+    _write_json(path, {"a": 1})
+    file_cache.validate_on_read = False
+    file_cache.get(path, load_json)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"a": ')
+    _touch_later(path)
+    assert watcher.check() == []
+    assert file_cache.get(path, load_json) == {"a": 1}
+
+    _write_json(path, {"a": 3})
+    _touch_later(path)
+    assert watcher.check() == [path]
+    assert file_cache.get(path, load_json) == {"a": 3}
+
+
+def test_check_drops_deleted_file(watched):
+    directory, file_cache, watcher, _ = watched
+    path = str(directory / "a.json")
+    _write_json(path, {"a": 1})
+    file_cache.validate_on_read = False
+    file_cache.get(path, load_json)
+    os.remove(path)
+    assert watcher.check() == [path]
+    assert not file_cache.contains(path)
+    with pytest.raises(FileNotFoundError):
+        file_cache.get(path, load_json)
+
+
+def test_watcher_reloads_in_background(watched):
+    directory, file_cache, watcher, indexed = watched
+    path = str(directory / "a.json")
+    _write_json(path, {"a": 1})
+    file_cache.get(path, load_json)
+    watcher.start()
+    try:
+        assert not file_cache.validate_on_read
+        _write_json(path, {"a": 2})
+        _touch_later(path)
+        deadline = time.monotonic() + 5
+        while not indexed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert file_cache.get(path, load_json) == {"a": 2}
+    finally:
+        watcher.stop()
+    assert file_cache.validate_on_read
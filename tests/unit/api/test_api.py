@@ -1,5 +1,12 @@
+import msgpack
 from flask import Response, url_for
 
+from metadata_service.api.content_negotiation import (
+    JSON,
+    MSGPACK,
+    negotiate_media_type,
+)
+
 
 def test_client_sends_x_request_id(flask_app):
     response: Response = flask_app.get(
@@ -13,3 +20,38 @@ def test_client_does_not_send_x_request_id(flask_app):
     response: Response = flask_app.get(url_for("observability.alive"))
     assert response.status_code == 200
     assert response.headers["X-Request-ID"]
+
+
+def test_negotiate_media_type():
+    assert negotiate_media_type(None) == JSON
+    assert negotiate_media_type("*/*") == JSON
+    assert negotiate_media_type("application/x-msgpack") == MSGPACK
+    assert (
+        negotiate_media_type("application/x-msgpack;q=0.9, */*;q=0.1")
+        == MSGPACK
+    )
+    assert negotiate_media_type("text/html") == JSON
+
+
+def test_error_response_is_negotiated(flask_app):
+    response: Response = flask_app.get(
+        "/no/such/path", headers={"Accept": "application/x-msgpack"}
+    )
+    assert response.status_code == 400
+    assert response.headers["Content-Type"] == "application/x-msgpack"
+    assert msgpack.loads(response.data)["type"] == "PATH_NOT_FOUND"
+
+
+def test_metrics(flask_app):
+    flask_app.get(url_for("observability.alive"))
+    response: Response = flask_app.get(url_for("observability.get_metrics"))
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert (
+        'http_requests_total{method="GET",route="/health/alive",status="200"}'
+        in body
+    )
+    assert 'cache_hits_total{cache="file"}' in body
+    assert 'cache_hits_total{cache="response"}' in body
+    assert "loaded_versions_size_bytes{pid=" in body
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import msgpack
+
+from metadata_service import asgi
+from metadata_service.domain import metadata
+
+
+def _request(method, path, query_string=b"", headers=(), body=b""):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ],
+        "server": ("localhost", 8000),
+        "client": ("127.0.0.1", 50000),
+    }
+    asyncio.run(asgi.app(scope, receive, send))
+    start = sent[0]
+    assert start["type"] == "http.response.start"
+    assert sent[-1] == {"type": "http.response.body", "body": b""}
+    return (
+        start["status"],
+        {name.decode(): value.decode() for name, value in start["headers"]},
+        b"".join(message.get("body", b"") for message in sent[1:]),
+    )
+
+
+def test_alive():
+    status, headers, body = _request(
+        "GET", "/health/alive", headers=[("X-Request-ID", "abc123")]
+    )
+    assert status == 200
+    assert headers["x-request-id"] == "abc123"
+    assert body == b"I'm alive!"
+
+
+def test_languages_msgpack():
+    status, headers, body = _request(
+        "GET", "/languages", headers=[("Accept", "application/x-msgpack")]
+    )
+    assert status == 200
+    assert headers["content-type"] == "application/x-msgpack"
+    assert msgpack.loads(body) == metadata.find_languages()
+
+
+def test_post_data_structure_status(mocker):
+    find_status = mocker.patch.object(
+        metadata,
+        "find_current_data_structure_status",
+        return_value={"A": None},
+    )
+    status, _, body = _request(
+        "POST",
+        "/metadata/data-structures/status",
+        headers=[("Content-Type", "application/json")],
+        body=json.dumps({"names": "A"}).encode(),
+    )
+    assert status == 200
+    assert json.loads(body) == {"A": None}
+    find_status.assert_called_once_with(["A"], None)
+
+
+def test_error_handlers():
+    status, _, body = _request("GET", "/no/such/path")
+    assert status == 400
+    assert json.loads(body)["type"] == "PATH_NOT_FOUND"
+
+
+def test_lifespan():
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app({"type": "lifespan"}, receive, send))
+    assert sent == [
+        {"type": "lifespan.startup.complete"},
+        {"type": "lifespan.shutdown.complete"},
+    ]
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metadata_service.api import compression
+
+
+def test_zstd_compresses_concurrently():
+    zstandard = pytest.importorskip("zstandard")
+    bodies = [str(i).encode() * 100_000 for i in range(32)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        compressed = list(
+            executor.map(
+                lambda body: compression.compress(body, "zstd"), bodies
+            )
+        )
+    decompressor = zstandard.ZstdDecompressor()
+    assert [decompressor.decompress(body) for body in compressed] == bodies
+
+
+def test_gzip_is_deterministic(mocker):
+    body = b"x" * 10_000
+    first = compression.compress(body, "gzip")
+    mocker.patch("time.time", return_value=4_000_000_000.0)
+    assert compression.compress(body, "gzip") == first
@@ -1,8 +1,14 @@
+import gzip
 import json
 
 import msgpack
+import pytest
 from flask import url_for, Response
 
+from metadata_service.adapter import datastore
+from metadata_service.adapter.datastore import CacheValidator
+from metadata_service.api.pagination import decode_cursor
+from metadata_service.api.response_cache import response_cache
 from metadata_service.domain import metadata
 from metadata_service.domain.version import Version
 
@@ -60,6 +66,10 @@ MOCKED_LANGUAGES = [
     {"code": "en", "label": "English"},
 ]
 
+MOCKED_VALIDATOR = CacheValidator(
+    signature=((1, 2, 3),), digest="abc", last_modified=1607332752.0
+)
+
 DATA_STRUCTURES_FILE_PATH = "tests/resources/fixtures/api/data_structures.json"
 METADATA_ALL_FILE_PATH = "tests/resources/fixtures/domain/metadata_all.json"
 
@@ -100,7 +110,7 @@ def test_get_current_data_structure_status(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with([MOCKED_DATASTRUCTURE["name"]])
+    spy.assert_called_with([MOCKED_DATASTRUCTURE["name"]], None)
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == MOCKED_DATASTRUCTURE
 
@@ -120,11 +130,29 @@ def test_get_current_data_structure_status_as_post(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with(list(MOCKED_DATASTRUCTURES.keys()))
+    spy.assert_called_with(list(MOCKED_DATASTRUCTURES.keys()), None)
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == MOCKED_DATASTRUCTURES
 
 
+def test_get_data_structure_status_at(flask_app, mocker):
+    spy = mocker.patch.object(
+        metadata,
+        "find_current_data_structure_status",
+        return_value=MOCKED_DATASTRUCTURE,
+    )
+    response: Response = flask_app.get(
+        url_for(
+            "metadata_api.get_data_structure_current_status",
+            names="INNTEKT_TJENPEN",
+            at=123123,
+        ),
+        headers={"Accept": "application/json"},
+    )
+    spy.assert_called_with(["INNTEKT_TJENPEN"], 123123)
+    assert response.json == MOCKED_DATASTRUCTURE
+
+
 def test_get_multiple_data_structure_status(flask_app, mocker):
     spy = mocker.patch.object(
         metadata,
@@ -142,7 +170,7 @@ def test_get_multiple_data_structure_status(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with(["INNTEKT_TJENPEN", "INNTEKT_TO"])
+    spy.assert_called_with(["INNTEKT_TJENPEN", "INNTEKT_TO"], None)
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == MOCKED_DATASTRUCTURE
 
@@ -168,7 +196,7 @@ def test_get_data_structures(flask_app, mocker):
     )
 
     spy.assert_called_with(
-        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, False
+        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, False, []
     )
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == mocked_data_structures
@@ -194,7 +222,7 @@ def test_get_data_structures_with_messagepack(flask_app, mocker):
         },
     )
     spy.assert_called_with(
-        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, False
+        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, False, []
     )
     assert response.headers["Content-Type"] == "application/x-msgpack"
     assert msgpack.loads(response.data) == mocked_data_structures
@@ -246,7 +274,7 @@ def test_get_all_metadata(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with(Version("3.2.1.0"), False)
+    spy.assert_called_with(Version("3.2.1.0"), False, [])
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == mocked_metadata_all
 
@@ -276,7 +304,7 @@ def test_get_all_metadata_long_version_numbers(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with(Version("1234.5678.9012.0"), False)
+    spy.assert_called_with(Version("1234.5678.9012.0"), False, [])
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == mocked_metadata_all
 
@@ -313,7 +341,7 @@ def test_get_all_metadata_skip_code_lists(flask_app, mocker):
             "Accept": "application/json",
         },
     )
-    spy.assert_called_with(Version("3.2.1.0"), True)
+    spy.assert_called_with(Version("3.2.1.0"), True, [])
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == mocked_metadata_all
 
@@ -339,7 +367,657 @@ def test_get_data_structures_skip_code_lists(flask_app, mocker):
         },
     )
     spy.assert_called_with(
-        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, True
+        ["FNR", "AKT_ARBAP"], Version("3.2.1.0"), True, True, []
     )
     assert response.headers["Content-Type"] == "application/json"
     assert response.json == mocked_data_structures
+
+
+def test_get_all_metadata_is_served_from_response_cache(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    validator = mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    for _ in range(2):
+        response: Response = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+            headers={"Accept": "application/json"},
+        )
+        assert response.json == mocked_metadata_all
+    spy.assert_called_once_with(Version("1.0.0.0"), False, [])
+
+    validator.return_value = CacheValidator(
+        signature=((4, 5, 6),), digest="def", last_modified=1607332762.0
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/json"},
+    )
+    assert response.json == mocked_metadata_all
+    assert spy.call_count == 2
+    response_cache.clear()
+
+
+def test_get_data_structures_response_cache_key_includes_names(
+    flask_app, mocker
+):
+    with open(DATA_STRUCTURES_FILE_PATH, encoding="utf-8") as f:
+        mocked_data_structures = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata, "find_data_structures", return_value=mocked_data_structures
+    )
+    for names in ["FNR", "FNR,AKT_ARBAP", "FNR"]:
+        flask_app.get(
+            url_for(
+                "metadata_api.get_data_structures",
+                names=names,
+                version="1.0.0.0",
+            ),
+            headers={"Accept": "application/json"},
+        )
+    assert spy.call_count == 2
+    response_cache.clear()
+
+
+def test_get_all_metadata_caches_each_media_type(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    for _ in range(2):
+        json_response: Response = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+            headers={"Accept": "application/json"},
+        )
+        msgpack_response: Response = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+            headers={"Accept": "application/x-msgpack"},
+        )
+    assert spy.call_count == 2
+    assert json_response.headers["Content-Type"] == "application/json"
+    assert json_response.json == mocked_metadata_all
+    assert msgpack_response.headers["Content-Type"] == "application/x-msgpack"
+    assert msgpack.loads(msgpack_response.data) == mocked_metadata_all
+    assert "Accept" in msgpack_response.headers["Vary"]
+    response_cache.clear()
+
+
+def test_get_all_metadata_streamed(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="3.2.1.0"),
+        headers={"Accept": "application/json"},
+    )
+    streamed_response: Response = flask_app.get(
+        url_for(
+            "metadata_api.get_all_metadata", version="3.2.1.0", stream=True
+        ),
+        headers={"Accept": "application/json"},
+    )
+    assert streamed_response.is_streamed
+    assert streamed_response.headers["Content-Type"] == "application/json"
+    assert streamed_response.data == response.data
+
+    streamed_response = flask_app.get(
+        url_for(
+            "metadata_api.get_all_metadata", version="3.2.1.0", stream=True
+        ),
+        headers={"Accept": "application/x-msgpack"},
+    )
+    assert msgpack.loads(streamed_response.data) == mocked_metadata_all
+
+
+def test_get_data_structures_streamed(flask_app, mocker):
+    with open(DATA_STRUCTURES_FILE_PATH, encoding="utf-8") as f:
+        mocked_data_structures = json.load(f)
+    mocker.patch.object(
+        metadata, "find_data_structures", return_value=mocked_data_structures
+    )
+    for accept, decode in [
+        ("application/json", json.loads),
+        ("application/x-msgpack", msgpack.loads),
+    ]:
+        response: Response = flask_app.get(
+            url_for(
+                "metadata_api.get_data_structures",
+                version="3.2.1.0",
+                stream=True,
+            ),
+            headers={"Accept": accept},
+        )
+        assert response.is_streamed
+        assert decode(response.data) == mocked_data_structures
+
+
+def test_get_all_metadata_not_modified(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/json"},
+    )
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert response.headers["Last-Modified"]
+    response_cache.clear()
+
+    not_modified: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/json", "If-None-Match": etag},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.data == b""
+
+    not_modified = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={
+            "Accept": "application/json",
+            "If-Modified-Since": response.headers["Last-Modified"],
+        },
+    )
+    assert not_modified.status_code == 304
+    spy.assert_called_once()
+
+    msgpack_response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/x-msgpack", "If-None-Match": etag},
+    )
+    assert msgpack_response.status_code == 200
+    assert msgpack_response.headers["ETag"] != etag
+    modified_since_earlier = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={
+            "Accept": "application/json",
+            "If-Modified-Since": "Mon, 07 Dec 2020 09:19:11 GMT",
+        },
+    )
+    assert modified_since_earlier.status_code == 200
+    response_cache.clear()
+
+
+def test_get_all_metadata_outdated_draft_is_not_modified(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        datastore, "get_draft_version", return_value={"version": "0.0.0.1"}
+    )
+    mocker.patch.object(
+        datastore,
+        "get_metadata_all_validator",
+        return_value=MOCKED_VALIDATOR,
+    )
+    spy = mocker.patch.object(metadata, "find_all_metadata")
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="0.0.0.999"),
+        headers={
+            "Accept": "application/json",
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+        },
+    )
+    assert response.status_code == 404
+    spy.assert_not_called()
+
+
+def test_get_all_metadata_compressed(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    for _ in range(2):
+        response: Response = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+            headers={
+                "Accept": "application/x-msgpack",
+                "Accept-Encoding": "gzip",
+            },
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert (
+            msgpack.loads(gzip.decompress(response.data))
+            == mocked_metadata_all
+        )
+    spy.assert_called_once()
+
+    uncompressed: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/x-msgpack"},
+    )
+    assert "Content-Encoding" not in uncompressed.headers
+    assert uncompressed.headers["ETag"] != response.headers["ETag"]
+    assert msgpack.loads(uncompressed.data) == mocked_metadata_all
+    spy.assert_called_once()
+    response_cache.clear()
+
+
+def test_get_all_metadata_etag_follows_sent_encoding(flask_app, mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    streamed: Response = flask_app.get(
+        url_for(
+            "metadata_api.get_all_metadata", version="1.0.0.0", stream=True
+        ),
+        headers={"Accept": "application/json", "Accept-Encoding": "gzip"},
+    )
+    assert "Content-Encoding" not in streamed.headers
+    uncompressed: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/json"},
+    )
+    assert streamed.headers["ETag"] == uncompressed.headers["ETag"]
+
+    response_cache.clear()
+    compressed: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={"Accept": "application/json", "Accept-Encoding": "gzip"},
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] != streamed.headers["ETag"]
+
+    response_cache.clear()
+    for etag in (compressed.headers["ETag"], uncompressed.headers["ETag"]):
+        not_modified: Response = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+            headers={
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip",
+                "If-None-Match": etag,
+            },
+        )
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+    response_cache.clear()
+
+
+@pytest.mark.parametrize(
+    "encoding, module_name", [("br", "brotli"), ("zstd", "zstandard")]
+)
+def test_get_all_metadata_compressed_optional_encodings(
+    flask_app, mocker, encoding, module_name
+):
+    module = pytest.importorskip(module_name)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    mocker.patch.object(
+        metadata, "find_all_metadata", return_value=mocked_metadata_all
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_metadata", version="1.0.0.0"),
+        headers={
+            "Accept": "application/json",
+            "Accept-Encoding": f"gzip;q=0.5, {encoding}",
+        },
+    )
+    assert response.headers["Content-Encoding"] == encoding
+    if module_name == "brotli":
+        body = module.decompress(response.data)
+    else:
+        body = module.ZstdDecompressor().decompress(response.data)
+    assert json.loads(body) == mocked_metadata_all
+    response_cache.clear()
+
+
+def test_get_all_metadata_fields_are_cached_separately(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata,
+        "find_all_metadata",
+        side_effect=lambda version, skip_code_lists, fields: {
+            "fields": fields
+        },
+    )
+    for _ in range(2):
+        full = flask_app.get(
+            url_for("metadata_api.get_all_metadata", version="1.0.0.0")
+        )
+        projected = flask_app.get(
+            url_for(
+                "metadata_api.get_all_metadata",
+                version="1.0.0.0",
+                fields="name,measureVariable.dataType",
+            )
+        )
+        assert full.json == {"fields": []}
+        assert projected.json == {
+            "fields": ["name", "measureVariable.dataType"]
+        }
+    assert spy.call_count == 2
+
+
+def test_get_data_structures_paged(flask_app, mocker):
+    mocker.patch.object(metadata, "find_metadata_validator", return_value=None)
+    spy = mocker.patch.object(
+        metadata,
+        "find_data_structures_page",
+        side_effect=[([{"name": "A"}, {"name": "B"}], "B"), ([], None)],
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_data_structures", version="1.0.0.0", limit=2)
+    )
+    assert response.json == [{"name": "A"}, {"name": "B"}]
+    spy.assert_called_once_with(
+        Version("1.0.0.0"), [], 2, None, True, False, []
+    )
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor) == "B"
+
+    response = flask_app.get(
+        url_for(
+            "metadata_api.get_data_structures",
+            version="1.0.0.0",
+            limit=2,
+            cursor=cursor,
+        )
+    )
+    assert response.json == []
+    assert "X-Next-Cursor" not in response.headers
+    spy.assert_called_with(Version("1.0.0.0"), [], 2, "B", True, False, [])
+
+
+def test_get_data_structures_paged_is_cached(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata,
+        "find_data_structures_page",
+        return_value=([{"name": "A"}], "A"),
+    )
+    url = url_for(
+        "metadata_api.get_data_structures", version="1.0.0.0", limit=1
+    )
+    response: Response = flask_app.get(url)
+    cached: Response = flask_app.get(url)
+    assert cached.json == [{"name": "A"}]
+    assert cached.headers["X-Next-Cursor"] == response.headers["X-Next-Cursor"]
+    not_modified: Response = flask_app.get(
+        url, headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+    spy.assert_called_once()
+    response_cache.clear()
+
+
+def test_get_data_structures_invalid_page(flask_app):
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_data_structures", version="1.0.0.0", limit=0)
+    )
+    assert response.status_code == 400
+    for cursor in ("not base64!", "!!!", ""):
+        response = flask_app.get(
+            url_for(
+                "metadata_api.get_data_structures",
+                version="1.0.0.0",
+                cursor=cursor,
+            )
+        )
+        assert response.status_code == 400
+
+
+def test_get_all_data_structures_ever_paged(flask_app, mocker):
+    mocker.patch.object(
+        metadata,
+        "find_all_data_structures_ever",
+        return_value=["A", "B", "C"],
+    )
+    response: Response = flask_app.get(
+        url_for("metadata_api.get_all_data_structures_ever", limit=2)
+    )
+    assert response.json == ["A", "B"]
+    response = flask_app.get(
+        url_for(
+            "metadata_api.get_all_data_structures_ever",
+            limit=2,
+            cursor=response.headers["X-Next-Cursor"],
+        )
+    )
+    assert response.json == ["C"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_data_structures_in_versions(flask_app, mocker):
+    spy = mocker.patch.object(
+        metadata,
+        "find_data_structures_in_versions",
+        return_value=[[{"name": "A"}], []],
+    )
+    response: Response = flask_app.post(
+        url_for("metadata_api.get_data_structures_in_versions"),
+        json={
+            "requests": [
+                {"version": "1.0.0.0", "names": ["A"]},
+                {"version": "2.0.0.0", "names": ["A"]},
+            ],
+            "fields": "name",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json == [
+        {"version": "1.0.0.0", "dataStructures": [{"name": "A"}]},
+        {"version": "2.0.0.0", "dataStructures": []},
+    ]
+    spy.assert_called_once_with(
+        [(Version("1.0.0.0"), ["A"]), (Version("2.0.0.0"), ["A"])],
+        False,
+        ["name"],
+    )
+
+
+def test_get_data_structures_in_versions_invalid(flask_app):
+    for body in (
+        {"requests": []},
+        {"requests": [{"version": "1.0.0", "names": ["A"]}]},
+        {"requests": [{"version": "1.0.0.0"}]},
+        {"requests": [{"version": "1.0.0.0", "names": []}]},
+    ):
+        response: Response = flask_app.post(
+            url_for("metadata_api.get_data_structures_in_versions"),
+            json=body,
+        )
+        assert response.status_code == 400
+
+
+def test_get_version_diff(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_version_diff_validator", return_value=MOCKED_VALIDATOR
+    )
+    mocked_diff = {
+        "added": ["B"],
+        "removed": [],
+        "changed": [
+            {
+                "name": "A",
+                "changes": [{"path": "label", "from": "a", "to": "b"}],
+            }
+        ],
+    }
+    spy = mocker.patch.object(
+        metadata, "find_version_diff", return_value=mocked_diff
+    )
+    for _ in range(2):
+        response: Response = flask_app.get(
+            url_for(
+                "metadata_api.get_version_diff",
+                from_version="1.0.0.0",
+                to_version="2.0.0.0",
+            ),
+            headers={"Accept": "application/json"},
+        )
+        assert response.status_code == 200
+        assert response.json == {
+            "fromVersion": "1.0.0.0",
+            "toVersion": "2.0.0.0",
+            **mocked_diff,
+        }
+    spy.assert_called_once_with(Version("1.0.0.0"), Version("2.0.0.0"))
+    response_cache.clear()
+
+
+def test_get_version_diff_invalid_version(flask_app):
+    response: Response = flask_app.get(
+        url_for(
+            "metadata_api.get_version_diff",
+            from_version="1.0.0",
+            to_version="2.0.0.0",
+        )
+    )
+    assert response.status_code == 400
+
+
+def test_search_data_structures(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    mocked_matches = [{"name": "A", "label": "Inntekt", "score": 4.394}]
+    spy = mocker.patch.object(
+        metadata, "find_data_structures_matching", return_value=mocked_matches
+    )
+    response: Response = flask_app.get(
+        url_for(
+            "metadata_api.search_data_structures",
+            version="1.0.0.0",
+            q="inntekt",
+            limit=5,
+        ),
+        headers={"Accept": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.json == mocked_matches
+    spy.assert_called_once_with(Version("1.0.0.0"), "inntekt", 5)
+    response_cache.clear()
+
+
+def test_search_data_structures_invalid_query(flask_app):
+    for params in (
+        {"version": "1.0.0.0", "q": " "},
+        {"version": "1.0.0.0", "q": "inntekt", "limit": 101},
+        {"version": "1.0.0", "q": "inntekt"},
+    ):
+        response: Response = flask_app.get(
+            url_for("metadata_api.search_data_structures", **params)
+        )
+        assert response.status_code == 400
+
+
+def test_get_code_list(flask_app, mocker):
+    mocker.patch.object(metadata, "find_metadata_validator", return_value=None)
+    spy = mocker.patch.object(
+        metadata,
+        "find_code_list",
+        side_effect=[
+            ([{"code": "CAT", "category": "Katt"}], 1),
+            ([{"code": "DOG", "category": "Hund"}], None),
+        ],
+    )
+    response: Response = flask_app.get(
+        url_for(
+            "metadata_api.get_code_list",
+            version="1.0.0.0",
+            name="PETS",
+            prefix="k",
+            limit=1,
+        )
+    )
+    assert response.json == [{"code": "CAT", "category": "Katt"}]
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor) == "1"
+    spy.assert_called_with(Version("1.0.0.0"), "PETS", None, None, "k", 1, 0)
+
+    response = flask_app.get(
+        url_for(
+            "metadata_api.get_code_list",
+            version="1.0.0.0",
+            name="PETS",
+            prefix="k",
+            limit=1,
+            cursor=cursor,
+        )
+    )
+    assert response.json == [{"code": "DOG", "category": "Hund"}]
+    assert "X-Next-Cursor" not in response.headers
+    spy.assert_called_with(Version("1.0.0.0"), "PETS", None, None, "k", 1, 1)
+
+
+def test_get_code_list_is_cached(flask_app, mocker):
+    response_cache.clear()
+    mocker.patch.object(
+        metadata, "find_metadata_validator", return_value=MOCKED_VALIDATOR
+    )
+    spy = mocker.patch.object(
+        metadata,
+        "find_code_list",
+        return_value=([{"code": "CAT", "category": "Katt"}], 1),
+    )
+    url = url_for(
+        "metadata_api.get_code_list", version="1.0.0.0", name="PETS", limit=1
+    )
+    response: Response = flask_app.get(url)
+    cached: Response = flask_app.get(url)
+    assert cached.json == [{"code": "CAT", "category": "Katt"}]
+    assert decode_cursor(cached.headers["X-Next-Cursor"]) == "1"
+    not_modified: Response = flask_app.get(
+        url, headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+    spy.assert_called_once()
+    response_cache.clear()
+
+
+def test_get_code_list_invalid_query(flask_app):
+    for params in (
+        {"version": "1.0.0.0", "name": "PETS", "code": "CAT", "prefix": "k"},
+        {"version": "1.0.0.0", "name": "PETS", "cursor": "QQ=="},
+        {"version": "1.0.0.0", "name": "PETS", "limit": 0},
+        {"version": "1.0.0.0"},
+    ):
+        response: Response = flask_app.get(
+            url_for("metadata_api.get_code_list", **params)
+        )
+        assert response.status_code == 400
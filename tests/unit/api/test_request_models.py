@@ -1,7 +1,7 @@
 import pytest
 from pydantic import ValidationError
 
-from metadata_service.api.request_models import MetadataQuery
+from metadata_service.api.request_models import BatchItem, MetadataQuery
 from metadata_service.exceptions.exceptions import RequestValidationException
 
 
@@ -55,3 +55,25 @@ def test_metadata_query_invalid_names():
     assert (
         "names field must be a list or a string" in e.value.message["message"]
     )
+
+
+def test_metadata_query_fields():
+    assert MetadataQuery(version="1.0.0.0").fields == []
+    query = MetadataQuery(
+        version="1.0.0.0", fields=["name,measureVariable.dataType"]
+    )
+    assert query.fields == ["name", "measureVariable.dataType"]
+
+
+def test_metadata_query_invalid_fields():
+    with pytest.raises(RequestValidationException) as e:
+        MetadataQuery(version="1.0.0.0", fields="name,measure..dataType")
+    assert "Field is in incorrect format" in e.value.message["message"]
+
+
+def test_batch_item_requires_names():
+    assert BatchItem(version="1.0.0.0", names=["A"]).names == ["A"]
+    for names in ({}, {"names": []}):
+        with pytest.raises(RequestValidationException) as e:
+            BatchItem(version="1.0.0.0", **names)
+        assert "names are required" in e.value.message["message"]
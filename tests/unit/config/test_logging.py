@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+
+from flask import Flask, g
+
+from metadata_service.config.logging import (
+    BoundedQueueHandler,
+    DrainingQueueListener,
+    MicrodataJSONFormatter,
+)
+
+
+def _record(message, *args, exc_info=None):
+    return logging.LogRecord(
+        "root", logging.INFO, __file__, 1, message, args, exc_info
+    )
+
+
+def test_queue_handler_captures_flask_context():
+    handler = BoundedQueueHandler(10)
+    app = Flask(__name__)
+    with app.test_request_context("/metadata/all?version=1.0.0.0"):
+        g.correlation_id = "abc 123"
+        g.response_time_ms = 5
+        g.response_status = 200
+        handler.handle(_record("responded %s", "ok"))
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "responded ok"
+    line = json.loads(MicrodataJSONFormatter().format(record))
+    assert line["message"] == "responded ok"
+    assert line["method"] == "GET"
+    assert line["url"] == "http://localhost/metadata/all?version=1.0.0.0"
+    assert line["statusCode"] == 200
+    assert line["xRequestId"] == "abc123"
+
+
+def test_queue_handler_formats_exceptions_before_queueing():
+    handler = BoundedQueueHandler(10)
+    try:
+        raise ValueError("broken")
+    except ValueError as e:
+        handler.handle(_record("failed", exc_info=(type(e), e, None)))
+
+    record = handler.queue.get_nowait()
+    assert record.exc_info is None
+    line = json.loads(MicrodataJSONFormatter().format(record))
+    assert "ValueError: broken" in line["error.stack"]
+
+
+def test_queue_handler_drops_records_when_full():
+    handler = BoundedQueueHandler(1)
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "first"
+
+
+def test_formatter_timestamp():
+    record = _record("message")
+    record.created = 1607332752.0456
+    line = json.loads(MicrodataJSONFormatter().format(record))
+    assert line["@timestamp"] == "2020-12-07T09:19:12.045Z"
+
+
+def test_draining_listener_writes_queued_records_when_stopped():
+    class BlockingHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+            self.writing = threading.Event()
+            self.unblocked = threading.Event()
+
+        def emit(self, record):
+            self.writing.set()
+            self.unblocked.wait()
+            self.messages.append(record.getMessage())
+
+    queue_handler = BoundedQueueHandler(1)
+    handler = BlockingHandler()
+    listener = DrainingQueueListener(queue_handler.queue, handler)
+    listener.start()
+    queue_handler.handle(_record("first"))
+    handler.writing.wait()
+    queue_handler.handle(_record("second"))
+    threading.Timer(0.1, handler.unblocked.set).start()
+    listener.stop()
+    assert handler.messages == ["first", "second"]
@@ -0,0 +1,64 @@
+import logging
+import pstats
+
+from flask import Flask, g, request
+
+from metadata_service.config import environment
+from metadata_service.config.profiling import RequestCounter, setup_profiling
+
+
+def _profiled_app(mocker, profile_dir, sample_rate):
+    mocker.patch.dict(
+        environment._ENVIRONMENT_VARIABLES,
+        {"PROFILE_DIR": str(profile_dir), "PROFILE_SAMPLE_RATE": sample_rate},
+    )
+    app = Flask(__name__)
+
+    @app.before_request
+    def set_correlation_id():
+        g.correlation_id = request.headers["X-Request-ID"]
+
+    setup_profiling(app)
+
+    @app.get("/work")
+    def work():
+        return str(sum(range(1000)))
+
+    return app.test_client()
+
+
+def test_profiles_requests_with_header(mocker, tmp_path):
+    client = _profiled_app(mocker, tmp_path, "0")
+    client.get("/work", headers={"X-Request-ID": "not-profiled"})
+    client.get(
+        "/work", headers={"X-Request-ID": "abc/123", "X-Profile": "true"}
+    )
+    assert [path.name for path in tmp_path.iterdir()] == ["abc123.prof"]
+    stats = pstats.Stats(str(tmp_path / "abc123.prof"))
+    assert any(function_name == "work" for _, _, function_name in stats.stats)
+
+
+def test_profiles_sampled_requests(mocker, tmp_path, caplog):
+    client = _profiled_app(mocker, tmp_path, "1")
+    with caplog.at_level(logging.INFO):
+        client.get("/work", headers={"X-Request-ID": "sampled"})
+    assert (tmp_path / "sampled.prof").exists()
+    assert "overlapping 0 other requests" in caplog.text
+
+
+def test_disabled_without_profile_dir(mocker):
+    mocker.patch.dict(environment._ENVIRONMENT_VARIABLES, {"PROFILE_DIR": ""})
+    app = Flask(__name__)
+    setup_profiling(app)
+    assert not app.before_request_funcs
+
+
+def test_request_counter_counts_overlapping_requests():
+    requests = RequestCounter()
+    requests.start()
+    started, in_flight = requests.start()
+    requests.start()
+    requests.finish()
+    assert (started, in_flight) == (2, 2)
+    assert requests.finish() == 3
+    assert requests.in_flight == 1
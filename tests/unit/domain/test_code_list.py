@@ -0,0 +1,81 @@
+from metadata_service.domain.code_list import build_index, page
+
+VARIABLE = {
+    "name": "KOMMUNE",
+    "representedVariables": [
+        {
+            "validPeriod": {"start": 0, "stop": 100},
+            "valueDomain": {
+                "codeList": [
+                    {"code": "0301", "category": "Oslo"},
+                    {"code": "1103", "category": "Stavanger"},
+                    {"code": "4601", "category": "Bergen"},
+                ]
+            },
+        },
+        {
+            "validPeriod": {"start": 101},
+            "valueDomain": {
+                "codeList": [
+                    {"code": "0301", "category": "Oslo"},
+                    {"code": "5001", "category": "Trondheim"},
+                    {"code": "1804", "category": "Bodø"},
+                ]
+            },
+        },
+    ],
+}
+
+
+def _codes(entries: list[dict]) -> list[str]:
+    return [entry["code"] for entry in entries]
+
+
+def test_build_index_without_code_list():
+    assert (
+        build_index(
+            {
+                "name": "INNTEKT",
+                "representedVariables": [
+                    {"valueDomain": {"description": "Kroner"}}
+                ],
+            }
+        )
+        is None
+    )
+
+
+def test_page_all_entries():
+    index = build_index(VARIABLE)
+    entries, next_offset = page(index, None, None, 4, 0)
+    assert _codes(entries) == ["0301", "1103", "4601", "0301"]
+    assert entries[0]["validPeriod"] == {"start": 0, "stop": 100}
+    assert entries[3]["validPeriod"] == {"start": 101}
+    assert next_offset == 4
+    entries, next_offset = page(index, None, None, 4, next_offset)
+    assert _codes(entries) == ["5001", "1804"]
+    assert next_offset is None
+
+
+def test_page_by_code():
+    index = build_index(VARIABLE)
+    entries, next_offset = page(index, "0301", None, None, 0)
+    assert [entry["validPeriod"] for entry in entries] == [
+        {"start": 0, "stop": 100},
+        {"start": 101},
+    ]
+    assert next_offset is None
+    assert page(index, "9999", None, None, 0) == ([], None)
+
+
+def test_page_by_label_prefix():
+    index = build_index(VARIABLE)
+    assert _codes(page(index, None, "b", None, 0)[0]) == ["4601", "1804"]
+    assert _codes(page(index, None, "BOD", None, 0)[0]) == ["1804"]
+    entries, next_offset = page(index, None, "o", 1, 0)
+    assert _codes(entries) == ["0301"]
+    assert next_offset == 1
+    entries, next_offset = page(index, None, "o", 1, next_offset)
+    assert _codes(entries) == ["0301"]
+    assert next_offset is None
+    assert page(index, None, "x", None, 0) == ([], None)
@@ -0,0 +1,120 @@
+from metadata_service.domain.diff import content_hash, diff
+
+DATA_STRUCTURE = {
+    "name": "A",
+    "populationDescription": "Alle personer.",
+    "subjectFields": ["Inntekt"],
+    "measureVariable": {
+        "name": "A",
+        "label": "Kjæledyr",
+        "representedVariables": [
+            {
+                "validPeriod": {"start": 0},
+                "valueDomain": {
+                    "codeList": [
+                        {"code": "CAT", "category": "Katt"},
+                        {"code": "DOG", "category": "Hund"},
+                    ]
+                },
+            }
+        ],
+    },
+    "identifierVariables": [{"name": "PERSON_ID_1", "label": "Person"}],
+}
+
+
+def test_content_hash():
+    assert content_hash(DATA_STRUCTURE) == content_hash(
+        dict(reversed(DATA_STRUCTURE.items()))
+    )
+    assert content_hash(DATA_STRUCTURE) != content_hash(
+        {**DATA_STRUCTURE, "name": "B"}
+    )
+
+
+def test_diff_equal():
+    assert diff(DATA_STRUCTURE, DATA_STRUCTURE) == []
+
+
+def test_diff():
+    changed = {
+        **DATA_STRUCTURE,
+        "subjectFields": ["Inntekt", "Skatt"],
+        "measureVariable": {
+            **DATA_STRUCTURE["measureVariable"],
+            "label": "Husdyr",
+            "representedVariables": [
+                {
+                    "validPeriod": {"start": 0, "stop": 10},
+                    "valueDomain": {
+                        "codeList": [
+                            {"code": "CAT", "category": "Katter"},
+                            {"code": "FISH", "category": "Fisk"},
+                        ]
+                    },
+                }
+            ],
+        },
+        "identifierVariables": [
+            {"name": "PERSON_ID_1", "label": "Person", "format": "Long"}
+        ],
+    }
+    code_list_path = "measureVariable.representedVariables[0].valueDomain"
+    assert diff(DATA_STRUCTURE, changed) == [
+        {
+            "path": "identifierVariables[PERSON_ID_1].format",
+            "from": None,
+            "to": "Long",
+        },
+        {"path": "measureVariable.label", "from": "Kjæledyr", "to": "Husdyr"},
+        {
+            "path": "measureVariable.representedVariables[0].validPeriod.stop",
+            "from": None,
+            "to": 10,
+        },
+        {
+            "path": f"{code_list_path}.codeList",
+            "added": ["FISH"],
+            "removed": ["DOG"],
+        },
+        {
+            "path": f"{code_list_path}.codeList[CAT].category",
+            "from": "Katt",
+            "to": "Katter",
+        },
+        {"path": "subjectFields", "added": ["Skatt"], "removed": []},
+    ]
+
+
+def test_diff_new_represented_variable():
+    represented = DATA_STRUCTURE["measureVariable"]["representedVariables"]
+    code_list = [
+        {"code": str(code), "category": f"Kode {code}"} for code in range(1000)
+    ]
+    old = [{**represented[0], "valueDomain": {"codeList": code_list}}]
+    new = [
+        {**old[0], "validPeriod": {"start": 0, "stop": 100}},
+        {
+            "validPeriod": {"start": 101},
+            "valueDomain": {"codeList": [*code_list, {"code": "1000"}]},
+        },
+    ]
+    assert diff(old, new, "representedVariables") == [
+        {"path": "representedVariables", "added": [101], "removed": []},
+        {
+            "path": "representedVariables[0].validPeriod.stop",
+            "from": None,
+            "to": 100,
+        },
+    ]
+
+
+def test_diff_lists_by_position():
+    old = [{"a": 1}, {"a": 2}, {"a": 3}]
+    assert diff(old, [{"a": 1}, {"a": 4}]) == [
+        {"path": "[1].a", "from": 2, "to": 4},
+        {"path": "", "added": [], "removed": [2]},
+    ]
+    assert diff(["A", "B"], ["B", "A"]) == [
+        {"path": "", "from": ["A", "B"], "to": ["B", "A"]}
+    ]
@@ -9,6 +9,7 @@ from metadata_service.config import environment
 from metadata_service.domain import metadata
 from metadata_service.domain.version import Version
 from metadata_service.exceptions.exceptions import (
+    DataNotFoundException,
     InvalidStorageFormatException,
     InvalidDraftVersionException,
 )
@@ -71,16 +72,56 @@ def test_find_two_data_structures_without_attrs(mocker):
     assert len(actual) == 2
     income = next(
         data_structure
-        for data_structure in mocked_metadata_all["dataStructures"]
+        for data_structure in actual
         if data_structure["name"] == "TEST_PERSON_INCOME"
     )
     assert "attributeVariables" not in income
     pets = next(
         data_structure
-        for data_structure in mocked_metadata_all["dataStructures"]
+        for data_structure in actual
         if data_structure["name"] == "TEST_PERSON_PETS"
     )
     assert "attributeVariables" not in pets
+    assert all(
+        "attributeVariables" in data_structure
+        for data_structure in mocked_metadata_all["dataStructures"]
+    )
+
+
+def test_find_data_structures_keeps_datastore_order(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    actual = metadata.find_data_structures(
+        ["TEST_PERSON_PETS", "NO_SUCH_DATASET", "TEST_PERSON_INCOME"],
+        Version("1.0.0.0"),
+        True,
+        skip_code_lists=True,
+    )
+    assert [data_structure["name"] for data_structure in actual] == [
+        "TEST_PERSON_INCOME",
+        "TEST_PERSON_PETS",
+    ]
+
+
+def test_find_data_structures_from_compiled_metadata(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    with open(METADATA_ALL_NO_CODE_LIST_FILE_PATH, encoding="utf-8") as f:
+        metadata_no_code_list = json.load(f)
+    mocker.patch.object(
+        datastore,
+        "get_compiled_data_structures",
+        return_value=mocked_metadata_all["dataStructures"][1:],
+    )
+    get_metadata_all = mocker.patch.object(datastore, "get_metadata_all")
+    actual = metadata.find_data_structures(
+        ["TEST_PERSON_PETS"], Version("1.0.0.0"), True, skip_code_lists=True
+    )
+    assert actual == metadata_no_code_list["dataStructures"][1:]
+    get_metadata_all.assert_not_called()
 
 
 def test_find_data_structures_no_name_filter(mocker):
@@ -95,6 +136,37 @@ def test_find_data_structures_no_name_filter(mocker):
     assert len(actual) == 2
 
 
+def test_find_data_structures_with_fields(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    actual = metadata.find_data_structures(
+        ["TEST_PERSON_PETS"],
+        Version("1.0.0.0"),
+        True,
+        fields=["name", "measureVariable.dataType"],
+    )
+    assert actual == [
+        {"name": "TEST_PERSON_PETS", "measureVariable": {"dataType": "String"}}
+    ]
+
+
+def test_find_all_metadata_with_fields(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    actual = metadata.find_all_metadata(Version("1.0.0.0"), fields=["name"])
+    assert actual["dataStore"] == mocked_metadata_all["dataStore"]
+    assert actual["dataStructures"] == [
+        {"name": "TEST_PERSON_INCOME"},
+        {"name": "TEST_PERSON_PETS"},
+    ]
+
+
 def test_find_current_data_structure_status(mocker):
     with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
         mocked_datastore_versions = json.load(f)
@@ -176,6 +248,79 @@ def test_find_current_data_structure_status(mocker):
     assert actual_all == expected_all
 
 
+def test_find_current_data_structure_status_draft_overrides_released(
+    mocker,
+):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    mocked_draft_version = {
+        "version": "0.0.0.1608000000",
+        "releaseTime": 1608000000,
+        "dataStructureUpdates": [
+            {
+                "name": "TEST_PERSON_PETS",
+                "operation": "PATCH_METADATA",
+                "releaseStatus": "DRAFT",
+            }
+        ],
+    }
+    mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(
+        datastore, "get_draft_version", return_value=mocked_draft_version
+    )
+    assert metadata.find_current_data_structure_status(
+        ["TEST_PERSON_PETS", "TEST_PERSON_INCOME"]
+    ) == {
+        "TEST_PERSON_PETS": {
+            "operation": "PATCH_METADATA",
+            "releaseTime": 1608000000,
+            "releaseStatus": "DRAFT",
+        },
+        "TEST_PERSON_INCOME": {
+            "operation": "REMOVE",
+            "releaseTime": 1607332762,
+            "releaseStatus": "DELETED",
+        },
+    }
+
+
+def test_find_data_structure_status_at_release_time(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    with open(DRAFT_VERSION_FILE_PATH, encoding="utf-8") as f:
+        mocked_draft_version = json.load(f)
+    mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(
+        datastore, "get_draft_version", return_value=mocked_draft_version
+    )
+    names = ["TEST_PERSON_INCOME", "TEST_PERSON_HOBBIES"]
+
+    assert metadata.find_current_data_structure_status(
+        names, at=1607332700
+    ) == {"TEST_PERSON_INCOME": None, "TEST_PERSON_HOBBIES": None}
+    assert metadata.find_current_data_structure_status(
+        names, at=1607332752
+    ) == {
+        "TEST_PERSON_INCOME": {
+            "operation": "ADD",
+            "releaseTime": 1607332752,
+            "releaseStatus": "RELEASED",
+        },
+        "TEST_PERSON_HOBBIES": None,
+    }
+    assert metadata.find_current_data_structure_status(
+        names, at=1608000000
+    ) == metadata.find_current_data_structure_status(names)
+
+
 def test_find_all_datastore_versions(mocker):
     with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
         mocked_datastore_versions = json.load(f)
@@ -193,6 +338,7 @@ def test_find_all_datastore_versions(mocker):
     assert len(actual["versions"]) == 3
     assert actual["versions"][0]["version"] == "0.0.0.1608000000"
     assert actual["versions"][1]["version"] == "2.0.0.0"
+    assert len(mocked_datastore_versions["versions"]) == 2
 
 
 def test_find_all_datastore_versions_when_draft_version_empty(mocker):
@@ -226,6 +372,45 @@ def test_find_all_data_structures_ever(mocker):
     actual = metadata.find_all_data_structures_ever()
     assert len(actual) == 4
     assert isinstance(actual, List)
+    assert actual == sorted(actual)
+
+
+def test_find_all_data_structures_ever_after_new_version(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    get_datastore_versions = mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(datastore, "get_draft_version", return_value={})
+    assert metadata.find_all_data_structures_ever() == [
+        "TEST_PERSON_INCOME",
+        "TEST_PERSON_PETS",
+    ]
+
+    get_datastore_versions.return_value = {
+        **mocked_datastore_versions,
+        "versions": [
+            {
+                "version": "3.0.0.0",
+                "releaseTime": 1607332772,
+                "dataStructureUpdates": [
+                    {
+                        "name": "TEST_PERSON_AGE",
+                        "operation": "ADD",
+                        "releaseStatus": "RELEASED",
+                    }
+                ],
+            },
+            *mocked_datastore_versions["versions"],
+        ],
+    }
+    assert metadata.find_all_data_structures_ever() == [
+        "TEST_PERSON_AGE",
+        "TEST_PERSON_INCOME",
+        "TEST_PERSON_PETS",
+    ]
 
 
 def test_get_metadata_all_skip_code_list_and_missing_values(mocker):
@@ -246,6 +431,28 @@ def test_get_metadata_all_skip_code_list_and_missing_values(mocker):
     assert metadata_no_code_list == filtered_metadata
 
 
+def test_skip_code_list_and_missing_values_does_not_modify_source(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        original_metadata_all = json.load(f)
+
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    filtered_metadata = (
+        metadata.find_all_metadata_skip_code_list_and_missing_values(
+            Version("1.0.0.0")
+        )
+    )
+    assert mocked_metadata_all == original_metadata_all
+    assert filtered_metadata["dataStore"] is mocked_metadata_all["dataStore"]
+    assert (
+        filtered_metadata["dataStructures"][0]["temporalCoverage"]
+        is mocked_metadata_all["dataStructures"][0]["temporalCoverage"]
+    )
+
+
 def test_find_all_metadata_skip_code_list_and_missing_values_invalid_model(
     mocker,
 ):
@@ -339,3 +546,277 @@ def _assert_code_list_and_missing_values(metadata_all):
             for variable in represented_variables
         ]
     )
+
+
+def test_preload_released_versions(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(datastore, "get_draft_version", return_value={})
+    get_metadata_all = mocker.patch.object(
+        datastore,
+        "get_metadata_all",
+        side_effect=[
+            DataNotFoundException("metadata_all not found"),
+            mocked_metadata_all,
+        ],
+    )
+    mocker.patch.object(datastore, "get_cache_headroom", return_value=10**9)
+    mocker.patch.object(datastore, "is_metadata_all_cached", return_value=True)
+    assert metadata.preload_released_versions() == 1
+    assert get_metadata_all.call_args_list == [
+        mocker.call(Version("2.0.0.0")),
+        mocker.call(Version("1.0.0.0")),
+    ]
+
+
+def test_preload_released_versions_stops_when_cache_is_full(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(datastore, "get_draft_version", return_value={})
+    get_metadata_all = mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    # Version 2.0.0.0 takes 600 bytes, and only 400 are left after it
+    mocker.patch.object(
+        datastore, "get_cache_headroom", side_effect=[1000, 400, 400]
+    )
+    mocker.patch.object(datastore, "is_metadata_all_cached", return_value=True)
+    assert metadata.preload_released_versions() == 1
+    assert get_metadata_all.call_args_list == [mocker.call(Version("2.0.0.0"))]
+
+
+def test_preload_released_versions_counts_only_cached_versions(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        mocked_datastore_versions = json.load(f)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        mocked_metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore,
+        "get_datastore_versions",
+        return_value=mocked_datastore_versions,
+    )
+    mocker.patch.object(datastore, "get_draft_version", return_value={})
+    get_metadata_all = mocker.patch.object(
+        datastore, "get_metadata_all", return_value=mocked_metadata_all
+    )
+    mocker.patch.object(datastore, "get_cache_headroom", return_value=1000)
+    # Version 2.0.0.0 is too large for the cache
+    mocker.patch.object(
+        datastore, "is_metadata_all_cached", return_value=False
+    )
+    assert metadata.preload_released_versions() == 0
+    assert get_metadata_all.call_args_list == [mocker.call(Version("2.0.0.0"))]
+
+
+def test_index_document(mocker):
+    with open(DATASTORE_VERSIONS_FILE_PATH, encoding="utf-8") as f:
+        datastore_versions = json.load(f)
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        metadata_all = json.load(f)
+    get_derived = mocker.spy(datastore, "get_derived")
+
+    metadata.index_document(metadata_all)
+    metadata.index_document(datastore_versions)
+    metadata.index_document(datastore_versions["versions"][0])
+    assert [call.args[1] for call in get_derived.call_args_list] == [
+        "data_structure_positions",
+        "sorted_data_structure_names",
+        "data_structure_hashes",
+        "search_index",
+        "skip_code_list_and_missing_values",
+        "latest_statuses",
+        "status_histories",
+        "latest_statuses",
+    ]
+
+
+def test_find_data_structure_names_page(mocker):
+    mocker.patch.object(
+        datastore,
+        "get_metadata_all",
+        return_value={
+            "dataStructures": [{"name": name} for name in ["C", "A", "D", "B"]]
+        },
+    )
+    version = Version("1.0.0.0")
+    assert metadata.find_data_structure_names_page(version, [], 3, None) == (
+        ["A", "B", "C"],
+        "C",
+    )
+    assert metadata.find_data_structure_names_page(version, [], 3, "C") == (
+        ["D"],
+        None,
+    )
+    assert metadata.find_data_structure_names_page(version, [], None, "B") == (
+        ["C", "D"],
+        None,
+    )
+    assert metadata.find_data_structure_names_page(
+        version, ["D", "A", "X"], 2, None
+    ) == (["A", "D"], "D")
+    assert metadata.find_data_structure_names_page(version, [], 2, "D") == (
+        [],
+        None,
+    )
+
+
+def test_find_data_structures_page_is_in_name_order(mocker):
+    mocker.patch.object(
+        datastore,
+        "get_metadata_all",
+        return_value={
+            "dataStructures": [{"name": name} for name in ["D", "C", "B", "A"]]
+        },
+    )
+    mocker.patch.object(
+        datastore, "get_compiled_data_structures", return_value=None
+    )
+    version = Version("1.0.0.0")
+    assert metadata.find_data_structures_page(version, [], 3, None, True) == (
+        [{"name": "A"}, {"name": "B"}, {"name": "C"}],
+        "C",
+    )
+    assert metadata.find_data_structures_page(
+        version, [], 3, "C", True, fields=["name"]
+    ) == ([{"name": "D"}], None)
+    assert metadata.find_data_structures(["A", "B"], version, True) == [
+        {"name": "B"},
+        {"name": "A"},
+    ]
+
+
+def test_find_data_structures_in_versions(mocker):
+    documents = {
+        "1.0.0.0": {"dataStructures": [{"name": "A", "v": 1}]},
+        "2.0.0.0": {
+            "dataStructures": [{"name": "A", "v": 2}, {"name": "B", "v": 2}]
+        },
+    }
+    get_metadata_all = mocker.patch.object(
+        datastore,
+        "get_metadata_all",
+        side_effect=lambda version: documents[str(version)],
+    )
+    mocker.patch.object(
+        datastore, "get_compiled_data_structures", return_value=None
+    )
+    actual = metadata.find_data_structures_in_versions(
+        [
+            (Version("2.0.0.0"), ["B", "A"]),
+            (Version("1.0.0.0"), ["A"]),
+            (Version("2.0.0.0"), ["A"]),
+        ],
+        fields=["v"],
+    )
+    assert actual == [[{"v": 2}, {"v": 2}], [{"v": 1}], [{"v": 2}]]
+    assert sorted(
+        str(call.args[0]) for call in get_metadata_all.call_args_list
+    ) == ["1.0.0.0", "2.0.0.0", "2.0.0.0"]
+
+
+def test_find_version_diff(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        from_metadata = json.load(f)
+    income, pets = from_metadata["dataStructures"]
+    to_metadata = {
+        **from_metadata,
+        "dataStructures": [
+            {**pets, "populationDescription": "Alle kjæledyr."},
+            {**income, "name": "TEST_PERSON_INCOME_2"},
+        ],
+    }
+    mocker.patch.object(
+        datastore,
+        "get_metadata_all",
+        side_effect=lambda version: (
+            from_metadata if version == Version("1.0.0.0") else to_metadata
+        ),
+    )
+    assert metadata.find_version_diff(
+        Version("1.0.0.0"), Version("2.0.0.0")
+    ) == {
+        "added": ["TEST_PERSON_INCOME_2"],
+        "removed": ["TEST_PERSON_INCOME"],
+        "changed": [
+            {
+                "name": "TEST_PERSON_PETS",
+                "changes": [
+                    {
+                        "path": "populationDescription",
+                        "from": pets["populationDescription"],
+                        "to": "Alle kjæledyr.",
+                    }
+                ],
+            }
+        ],
+    }
+    assert metadata.find_version_diff(
+        Version("1.0.0.0"), Version("1.0.0.0")
+    ) == {"added": [], "removed": [], "changed": []}
+
+
+def test_find_data_structures_matching(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=metadata_all
+    )
+    actual = metadata.find_data_structures_matching(
+        Version("1.0.0.0"), "katter", 10
+    )
+    assert [(match["name"], match["label"]) for match in actual] == [
+        ("TEST_PERSON_PETS", "Kjæledyr")
+    ]
+    assert actual[0]["score"] > 0
+    assert (
+        metadata.find_data_structures_matching(
+            Version("1.0.0.0"), "finnes ikke", 10
+        )
+        == []
+    )
+
+
+def test_find_code_list(mocker):
+    with open(METADATA_ALL_FILE_PATH, encoding="utf-8") as f:
+        metadata_all = json.load(f)
+    mocker.patch.object(
+        datastore, "get_metadata_all", return_value=metadata_all
+    )
+    entries, next_offset = metadata.find_code_list(
+        Version("1.0.0.0"), "TEST_PERSON_PETS", None, limit=2
+    )
+    assert [entry["code"] for entry in entries] == ["CAT", "DOG"]
+    assert next_offset == 2
+    entries, _ = metadata.find_code_list(
+        Version("1.0.0.0"), "TEST_PERSON_PETS", "TEST_PERSON_PETS", code="DOG"
+    )
+    assert entries == [
+        {"code": "DOG", "category": "Hund", "validPeriod": {"start": 0}}
+    ]
+    entries, _ = metadata.find_code_list(
+        Version("1.0.0.0"), "TEST_PERSON_PETS", None, prefix="ha"
+    )
+    assert [entry["code"] for entry in entries] == ["HAMSTER"]
+
+    with pytest.raises(DataNotFoundException):
+        metadata.find_code_list(Version("1.0.0.0"), "MISSING", None)
+    with pytest.raises(DataNotFoundException):
+        metadata.find_code_list(
+            Version("1.0.0.0"), "TEST_PERSON_PETS", "MISSING"
+        )
+    with pytest.raises(DataNotFoundException):
+        metadata.find_code_list(Version("1.0.0.0"), "TEST_PERSON_INCOME", None)
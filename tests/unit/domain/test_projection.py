@@ -0,0 +1,40 @@
+from metadata_service.domain.projection import field_tree, project
+
+DATA_STRUCTURE = {
+    "name": "A",
+    "label": "Label",
+    "measureVariable": {"dataType": "Long", "label": "Measure"},
+    "identifierVariables": [
+        {"name": "PERSON_ID_1", "dataType": "Long"},
+        {"name": "FAMILY_ID_1"},
+    ],
+}
+
+
+def test_field_tree():
+    assert field_tree(
+        ["name", "measureVariable.dataType", "measureVariable.label"]
+    ) == {"name": None, "measureVariable": {"dataType": None, "label": None}}
+    assert field_tree(["measureVariable.dataType", "measureVariable"]) == {
+        "measureVariable": None
+    }
+
+
+def test_project_nested_paths_and_lists():
+    assert project(
+        [DATA_STRUCTURE],
+        field_tree(
+            [
+                "name",
+                "measureVariable.dataType",
+                "identifierVariables.dataType",
+                "missing.key",
+            ]
+        ),
+    ) == [
+        {
+            "name": "A",
+            "measureVariable": {"dataType": "Long"},
+            "identifierVariables": [{"dataType": "Long"}, {}],
+        }
+    ]
@@ -0,0 +1,77 @@
+from metadata_service.domain.search import build_index, search, tokenize
+
+DATA_STRUCTURES = [
+    {
+        "name": "PERSON_INNTEKT",
+        "populationDescription": "Alle personer med inntekt.",
+        "measureVariable": {
+            "label": "Inntekt",
+            "representedVariables": [
+                {"description": "Personinntekt i norske kroner."}
+            ],
+        },
+    },
+    {
+        "name": "PERSON_KJAELEDYR",
+        "measureVariable": {
+            "label": "Kjæledyr",
+            "representedVariables": [
+                {
+                    "description": "Kjæledyrene til personen.",
+                    "valueDomain": {
+                        "codeList": [
+                            {"code": "CAT", "category": "Katt"},
+                            {"code": "DOG", "category": "Hund"},
+                        ]
+                    },
+                }
+            ],
+        },
+    },
+    {
+        "name": "SKATT",
+        "measureVariable": {
+            "label": "Inntektsskatt",
+            "representedVariables": [{"description": "Skatt på inntekt."}],
+        },
+    },
+]
+
+
+def test_tokenize():
+    assert tokenize("Inntektene til PERSON_ID_1, og Kjæledyr!") == [
+        "inntekt",
+        "til",
+        "person",
+        "id",
+        "1",
+        "og",
+        "kjæledyr",
+    ]
+    assert tokenize("inntekter") == tokenize("Inntektens") == ["inntekt"]
+    assert tokenize("") == []
+
+
+def test_search_ranks_matches():
+    index = build_index(DATA_STRUCTURES)
+    assert [position for position, _ in search(index, "inntekt", 10)] == [
+        0,
+        2,
+    ]
+    assert [position for position, _ in search(index, "katter", 10)] == [1]
+    assert [position for position, _ in search(index, "KJÆLEDYR", 10)] == [1]
+
+
+def test_search_requires_every_term():
+    index = build_index(DATA_STRUCTURES)
+    assert [
+        position for position, _ in search(index, "skatt inntekt", 10)
+    ] == [2]
+    assert search(index, "hund inntekt", 10) == []
+    assert search(index, "finnes ikke", 10) == []
+    assert search(index, "", 10) == []
+
+
+def test_search_limit():
+    index = build_index(DATA_STRUCTURES)
+    assert len(search(index, "inntekt", 1)) == 1